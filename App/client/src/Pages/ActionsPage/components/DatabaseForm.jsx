@@ -15,9 +15,11 @@ import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import axiosInstance from "../../../../axios.config";
 import { useActions } from "@/hooks/useActions";
+import { useCopilot } from "@/hooks/useCopilot";
 
 export function DatabaseForm({ closeModal }) {
   const { setDBInfo } = useActions();
+  const { socketInstance } = useCopilot();
 
   const formSchema = z.object({
     database_name: z
@@ -63,16 +65,19 @@ export function DatabaseForm({ closeModal }) {
 
   function onSubmit(values) {
     console.log(values);
+    // Ingest progress is sent only to this client's socket
+    const payload = socketInstance?.id ? { ...values, sid: socketInstance.id } : values;
     axiosInstance
-      .post("/api/databases", values, {
+      .post("/api/databases", payload, {
         headers: { "Content-Type": "multipart/form-data" },
       })
       .then((res) => {
         console.log(res);
         console.log(res.data);
         const { data, status } = res;
-        if (status === 200) {
-          setDBInfo(data);
+        // 202: registered, profiling continues in the background
+        if (status === 200 || status === 202) {
+          setDBInfo(data.databases);
           closeModal();
         }
       });
@@ -0,0 +1 @@
+# App/server/benchmarks/__init__.py
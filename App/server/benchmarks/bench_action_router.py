@@ -0,0 +1,114 @@
+# App/server/benchmarks/bench_action_router.py
+# To run: (.venv) PS ...\NeuraCRM_updated\app> python -m server.benchmarks.bench_action_router
+"""
+Per-query cost of picking actions from a synthetic 5,000-action catalog:
+the old keyword scorer that scans every action with substring checks,
+versus a search over the BM25 ActionIndex built once for the catalog.
+
+Also routes API-sounding queries through ActionAgent.actions_router_node
+against the shipped catalog, which has no api_call actions: they must reach
+the database path, never api_type_node without an action to call.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+from types import SimpleNamespace
+
+from ..utils.action_agent import ActionAgent
+from ..utils.action_index import ActionIndex
+
+CATALOG_SIZE = 5000
+QUERIES = 200
+
+ACTIONS_FILE = os.path.join(os.path.dirname(__file__), "..", "text_db", "actions.txt")
+# Contain "email", "send", "create" or "schedule" but match only database actions
+API_WORDED_QUERIES = [
+    "What is John Doe's email?",
+    "send John Doe the invoice",
+    "Create a summary of sales for Shop 3",
+    "Schedule a review of customer Jane Roe's purchase history",
+]
+
+WORDS = (
+    "customer order invoice product price category shop store city state sales revenue refund "
+    "shipment delivery warehouse stock supplier payment discount coupon loyalty ticket support "
+    "region quarter month year report summary history profile address phone email contact age"
+).split()
+
+
+def make_catalog(rng: random.Random):
+    catalog = []
+    for i in range(CATALOG_SIZE):
+        name = " ".join(rng.sample(WORDS, 2)).title() + f" Query {i}"
+        description = "Get " + " ".join(rng.choices(WORDS, k=12)) + " details"
+        inputs = [" ".join(rng.sample(WORDS, 2)).title() for _ in range(rng.randint(1, 3))]
+        catalog.append({"action_name": name, "action_description": description, "input": inputs})
+    return catalog
+
+
+def legacy_search(query: str, actions, k: int = 2):
+    # The scorer actions_router_node used before the index
+    query = query.lower()
+
+    def relevance_score(action):
+        score = 0
+        if any(word in query for word in action["action_name"].lower().split()):
+            score += 2
+        for word in action["action_description"].lower().split():
+            if word in query:
+                score += 1
+        for param in action["input"]:
+            if param.lower() in query:
+                score += 2
+        return score
+
+    matches = sorted([(a, relevance_score(a)) for a in actions], key=lambda x: x[1], reverse=True)
+    return [a for a, s in matches if s >= 2][:k]
+
+
+def bench(label, fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    per_query = (time.perf_counter() - start) / len(queries) * 1000
+    print(f"{label:<28}{per_query:10.3f} ms/query")
+
+
+def check_api_worded_queries() -> int:
+    with open(ACTIONS_FILE, "r") as f:
+        catalog = json.load(f)
+    agent = SimpleNamespace(action_vectors=None, action_index=ActionIndex(catalog))
+    failures = 0
+    for query in API_WORDED_QUERIES:
+        route = ActionAgent.actions_router_node(agent, {"query": query})
+        if route["actions"] == "api_type_node" and not route.get("selected_actions"):
+            failures += 1
+            print(f"FAIL  {query!r} routed to api_type_node with no API action")
+        else:
+            print(f"ok    {query!r} -> {route['actions']}")
+    return failures
+
+
+def main():
+    logging.disable(logging.INFO)
+    if check_api_worded_queries():
+        sys.exit(1)
+
+    rng = random.Random(7)
+    catalog = make_catalog(rng)
+    queries = [f"show the {' '.join(rng.sample(WORDS, 3))} for customer {rng.randint(1, 999)}" for _ in range(QUERIES)]
+
+    start = time.perf_counter()
+    index = ActionIndex(catalog)
+    print(f"{'index build (once)':<28}{(time.perf_counter() - start) * 1000:10.3f} ms")
+
+    bench("legacy substring scan", lambda q: legacy_search(q, catalog), queries)
+    bench("BM25 index search", lambda q: index.search(q), queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# App/server/benchmarks/bench_workflow_compile.py
+# To run: (.venv) PS ...\NeuraCRM_updated\app> python -m server.benchmarks.bench_workflow_compile
+"""
+Per-query overhead of building + compiling the agent graphs versus reusing
+the graph compiled at construction time.
+
+Node bodies are replaced with no-op stubs so the numbers only reflect
+LangGraph setup and dispatch, not LLM or CSV work.
+"""
+
+import time
+import logging
+
+from ..utils.action_agent import DBAgent, ActionAgent
+
+
+class StubDBAgent(DBAgent):
+    def __init__(self):
+        self.agent = self.build_workflow()
+
+    def db_router_node(self, state):
+        return {"database": "NA"}
+
+    def db_router_edge(self, state):
+        return "general"
+
+    def general(self, state):
+        return {"output": "ok"}
+
+
+class StubActionAgent(ActionAgent):
+    def __init__(self):
+        self.agent = self.build_workflow()
+
+    def actions_router_node(self, state):
+        return {"actions": "fallback_to_ai"}
+
+    def actions_router_edge(self, state):
+        return "fallback"
+
+    def fallback_response(self, state):
+        return {"output": "ok"}
+
+
+def per_query_ms(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main(iterations: int = 200):
+    logging.disable(logging.INFO)
+    state = {"query": "details of customer A", "verbose": False}
+    for agent in (StubDBAgent(), StubActionAgent()):
+        name = type(agent).__name__
+        before = per_query_ms(lambda: agent.build_workflow().invoke(state), iterations)
+        after = per_query_ms(lambda: agent.agent.invoke(state), iterations)
+        print(f"{name:<16} compile per query: {before:7.3f} ms   compiled once: {after:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
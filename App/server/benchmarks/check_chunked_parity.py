@@ -0,0 +1,135 @@
+# App/server/benchmarks/check_chunked_parity.py
+# To run: (.venv) PS ...\NeuraCRM_updated\app> python -m server.benchmarks.check_chunked_parity
+"""
+Checks that chunked execution returns the same results as the in-memory
+path. A synthetic table with nulls, mixed types and repeated keys is queried
+both ways, with a chunk size chosen so that groups and matches span chunk
+boundaries. Exits non-zero on the first mismatch.
+"""
+
+import os
+import sys
+import logging
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from ..utils.chunked import Aggregate, Filter, TopK, chunked_query, in_memory_query
+from ..utils.fast_query import (
+    _render_table, execute_plan, execute_plan_chunked, plan_query, plan_table_query, try_table_query_chunked,
+)
+
+ROWS = 25_000
+CHUNK_ROWS = 997
+
+
+def make_table(path: str):
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        "Customer ID": rng.integers(1, 400, ROWS),
+        "Customer Name": rng.choice([f"Customer {c}" for c in "ABCDEFGHIJ"], ROWS),
+        "Region": rng.choice(["north", "south", "east", "west", None], ROWS),
+        "Amount": np.round(rng.normal(100, 40, ROWS), 2),
+        "Quantity": rng.integers(0, 20, ROWS),
+    })
+    df.loc[rng.choice(ROWS, 500, replace=False), "Amount"] = np.nan
+    df.to_csv(path, index=False)
+
+
+QUERIES = {
+    "total": dict(aggregates=[Aggregate("rows", "count"), Aggregate("amount", "sum", "Amount")]),
+    "filtered stats": dict(
+        filters=[Filter("Region", "==", "north"), Filter("Quantity", ">=", 5)],
+        aggregates=[Aggregate(f, f, "Amount") for f in ("sum", "count", "min", "max", "mean")],
+    ),
+    "group by region": dict(
+        group_by=["Region"],
+        aggregates=[Aggregate("rows", "count"), Aggregate("avg", "mean", "Amount"), Aggregate("top", "max", "Quantity")],
+    ),
+    "group by two keys": dict(
+        filters=[Filter("Amount", ">", 120)],
+        group_by=["Customer Name", "Region"],
+        aggregates=[Aggregate("qty", "sum", "Quantity"), Aggregate("low", "min", "Amount")],
+    ),
+    "top 10 amounts": dict(top_k=TopK("Amount", 10), columns=["Customer ID", "Amount"]),
+    "bottom 5 quantities": dict(filters=[Filter("Customer Name", "contains", "customer b")],
+                                top_k=TopK("Quantity", 5, largest=False)),
+    "lookup": dict(filters=[Filter("Customer ID", "in", [3, 42])], columns=["Customer Name", "Amount"], limit=50),
+    "no match": dict(filters=[Filter("Region", "==", "nowhere")], aggregates=[Aggregate("rows", "count")]),
+}
+
+PROMPTS = [
+    "Give me the total amount, average quantity of Customer C.",
+    "Give me the customer ID, amount for Customer D.",
+    "Give me the number of orders of customer name Customer E.",
+]
+ACTION = {"input": ["Customer Name"], "output": ["Amount"]}
+
+# Whole-table questions DBAgent streams through chunked_query; None means the
+# question must be left to the SQL agent
+TABLE_PROMPTS = {
+    "What is the total amount?": True,
+    "What is the average amount, maximum quantity by region?": True,
+    "Number of orders per customer name": True,
+    "Show me the top 5 rows by amount.": True,
+    "Give me the bottom 3 by quantity": True,
+    "What is the number of orders for Customer A?": None,
+    "What is the number of female customers?": None,
+    "Number of distinct customers": None,
+    "Number of customers today": None,
+    "Number of distinct orders": None,
+    "Number of orders today": None,
+    "Average amount by favourite colour": None,
+    "Who bought the most?": None,
+}
+
+
+def main() -> int:
+    logging.disable(logging.INFO)
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "orders.csv")
+        make_table(path)
+        df = pd.read_csv(path)
+
+        for name, query in QUERIES.items():
+            expected = in_memory_query(df, **query)
+            actual = chunked_query(path, chunk_rows=CHUNK_ROWS, **query)
+            try:
+                assert expected.matched_rows == actual.matched_rows, (expected.matched_rows, actual.matched_rows)
+                pd.testing.assert_frame_equal(expected.frame, actual.frame, check_dtype=False, check_index_type=False)
+                print(f"ok    {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"FAIL  {name}: {e}")
+
+        for prompt in PROMPTS:
+            plan = plan_query(prompt, ACTION, df)
+            expected = execute_plan(plan, df)
+            actual = execute_plan_chunked(plan, path, chunk_rows=CHUNK_ROWS)
+            if expected == actual:
+                print(f"ok    {prompt}")
+            else:
+                failures += 1
+                print(f"FAIL  {prompt}\n--- in memory\n{expected}\n--- chunked\n{actual}")
+
+        for prompt, plannable in TABLE_PROMPTS.items():
+            plan = plan_table_query(prompt, df, ["orders"])
+            actual = try_table_query_chunked(prompt, path, chunk_rows=CHUNK_ROWS)
+            if plannable is None:
+                expected = None
+            else:
+                expected = {"input": prompt, "output": _render_table(plan, in_memory_query(df, **plan.query_args()).frame)}
+            if expected == actual:
+                print(f"ok    {prompt}")
+            else:
+                failures += 1
+                print(f"FAIL  {prompt}\n--- in memory\n{expected}\n--- chunked\n{actual}")
+
+    print(f"{failures} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+# App/server/benchmarks/check_semantic_cache.py
+# To run: (.venv) PS ...\NeuraCRM_updated\app> python -m server.benchmarks.check_semantic_cache
+"""
+Checks that the semantic cache never answers a question about one customer,
+shop or ID with the cached answer for another. The stand-in embedding maps
+every query to the same vector, the worst case where every pair clears the
+similarity threshold, so only the cache key keeps answers apart. Exits
+non-zero on the first mismatch.
+"""
+
+import sys
+import logging
+
+import numpy as np
+
+from ..utils.semantic_cache import SemanticCache
+
+# (cached question, later question, whether the later one may reuse the answer)
+CASES = [
+    ("total sales for shop b", "total sales for shop c", False),
+    ("Total sales for Shop B", "total sales for shop b", True),
+    ("show details of customer A", "show details of customer B", False),
+    ("what is the age of john doe", "what is the age of jane doe", False),
+    ("orders for id es41", "orders for ID ES42", False),
+    ("revenue in 2023", "revenue in 2024", False),
+    ("how many orders did acme place", "How many orders did Acme place?", True),
+    # Nothing in these pins the answer down, so they are never cached
+    ("what is it", "what is it", False),
+]
+
+
+class SameVector:
+    def embed_query(self, query: str):
+        return np.ones(8, dtype=np.float32)
+
+
+def main() -> int:
+    logging.disable(logging.INFO)
+    failures = 0
+    for cached, asked, expect_hit in CASES:
+        cache = SemanticCache(SameVector())
+        cache.update("copilot", cached, f"answer to {cached!r}")
+        answer, _ = cache.lookup("copilot", asked)
+        if (answer is not None) == expect_hit:
+            print(f"ok    {cached!r} -> {asked!r}: {'hit' if expect_hit else 'miss'}")
+        else:
+            failures += 1
+            print(f"FAIL  {cached!r} -> {asked!r}: expected {'hit' if expect_hit else 'miss'}, got {answer!r}")
+    print(f"{failures} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# App/server/benchmarks/check_structured_retrieval.py
+# To run: (.venv) PS ...\NeuraCRM_updated\app> python -m server.benchmarks.check_structured_retrieval
+"""
+Checks that the batched UNWIND structured-retrieval query returns what the
+old one-query-per-entity loop returned, against an in-memory Neo4j stand-in.
+
+The stand-in answers both query shapes from the same graph: the fulltext
+index is emulated as Lucene fuzzy AND-matching ("john~2 AND doe~2", top 5 by
+score), and each entity keeps its own 50-row limit. The batched query must
+give the old rows, in order, with repeats removed, in a single round trip.
+Exits non-zero on the first mismatch.
+"""
+
+import re
+import sys
+import random
+import logging
+from types import SimpleNamespace
+
+from ..utils.chains import Chains, STRUCTURED_RETRIEVAL_QUERY
+from ..utils.data_models import Entities
+from ..utils.helpers import generate_full_text_query
+
+CASES = 300
+FULLTEXT_LIMIT = 5
+ROW_LIMIT = 50
+
+FIRST = ["John", "Jane", "Acme", "Globex", "Initech", "Project", "North", "Umbrella", "Stark", "Wayne"]
+SECOND = ["Smith", "Doe", "Corp", "Labs", "Phoenix", "Region", "Holdings", "Industries", "Group", "Retail"]
+REL_TYPES = ["WORKS_FOR", "OWNS", "LOCATED_IN", "PARTNERS_WITH", "SUPPLIES"]
+
+
+def edit_distance(a: str, b: str, cap: int = 3) -> int:
+    if abs(len(a) - len(b)) >= cap:
+        return cap
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (ca != cb))
+    return min(row[-1], cap)
+
+
+class FakeGraph:
+    """
+    Just enough of Neo4jGraph.query for the two retrieval query shapes.
+    """
+
+    def __init__(self, ids, edges):
+        self.ids = ids
+        self.outgoing = {i: [] for i in ids}
+        self.incoming = {i: [] for i in ids}
+        for source, rel, target in edges:
+            self.outgoing[source].append((rel, target))
+            self.incoming[target].append((rel, source))
+        self.round_trips = 0
+
+    def _fulltext(self, query: str):
+        terms = [(m.group(1).lower(), int(m.group(2))) for m in re.finditer(r"(\S+)~(\d)", query)]
+        hits = []
+        for node in self.ids:
+            tokens = node.lower().split()
+            distances = [min(edit_distance(term, t) for t in tokens) for term, _ in terms]
+            if terms and all(d <= fuzz for d, (_, fuzz) in zip(distances, terms)):
+                hits.append((-sum(distances), node))
+        return [node for _, node in sorted(hits)[:FULLTEXT_LIMIT]]
+
+    def _entity_rows(self, query: str):
+        rows = []
+        for node in self._fulltext(query):
+            rows += [f"{node} - {rel} -> {n}" for rel, n in self.outgoing[node]]
+            rows += [f"{n} - {rel} -> {node}" for rel, n in self.incoming[node]]
+        return rows[:ROW_LIMIT]
+
+    def query(self, cypher: str, params=None):
+        self.round_trips += 1
+        if cypher.lstrip().startswith("CREATE FULLTEXT INDEX"):
+            return []
+        if "UNWIND $queries" in cypher:
+            rows = [row for q in params["queries"] for row in self._entity_rows(q)]
+            return [{"output": row} for row in dict.fromkeys(rows)]
+        return [{"output": row} for row in self._entity_rows(params["query"])]
+
+
+def legacy_rows(graph: FakeGraph, names):
+    # The per-entity loop structured_retriever ran before batching
+    graph.query("CREATE FULLTEXT INDEX entity IF NOT EXISTS FOR (e:__Entity__) ON EACH [e.id]")
+    rows = []
+    for entity in names:
+        response = graph.query("... $query ...", {"query": generate_full_text_query(entity)})
+        rows += [el["output"] for el in response]
+    return rows
+
+
+def typo(rng: random.Random, word: str) -> str:
+    i = rng.randrange(len(word))
+    return word[:i] + rng.choice("aeiou") + word[i + 1:]
+
+
+def make_graph(rng: random.Random) -> FakeGraph:
+    ids = list(dict.fromkeys(f"{rng.choice(FIRST)} {rng.choice(SECOND)}" for _ in range(60)))
+    edges = [(rng.choice(ids), rng.choice(REL_TYPES), rng.choice(ids)) for _ in range(400)]
+    # A hub with more neighbours than the per-entity row limit
+    edges += [(ids[0], "MENTIONED_WITH", rng.choice(ids)) for _ in range(ROW_LIMIT + 20)]
+    return FakeGraph(ids, edges)
+
+
+def check_query_shape():
+    # Each entity's LIMIT must sit inside the per-query CALL, and rows are
+    # de-duplicated across entities at the end
+    body = STRUCTURED_RETRIEVAL_QUERY
+    assert "UNWIND $queries AS query" in body, "query is not batched"
+    assert re.search(rf"RETURN output LIMIT {ROW_LIMIT}\s*\}}\s*RETURN DISTINCT output\s*$", body), \
+        "per-entity LIMIT is not inside the CALL subquery"
+
+
+def main():
+    logging.disable(logging.INFO)
+    check_query_shape()
+    rng = random.Random(11)
+    saved_trips = 0
+    for case in range(CASES):
+        graph = make_graph(rng)
+        names = [rng.choice(graph.ids) for _ in range(rng.randint(1, 5))]
+        names = [typo(rng, n) if rng.random() < 0.3 else n for n in names]
+        if rng.random() < 0.3:
+            names.append(names[0])
+
+        expected = "\n".join(dict.fromkeys(legacy_rows(graph, names)))
+        old_trips = graph.round_trips
+        graph.round_trips = 0
+        chains = SimpleNamespace(graph_db=graph)
+        actual = Chains.structured_retriever(chains, Entities(names=names))
+        if actual != expected:
+            print(f"case {case}: MISMATCH for {names}\n--- old\n{expected}\n--- new\n{actual}")
+            sys.exit(1)
+        if graph.round_trips != 1:
+            print(f"case {case}: expected one round trip, got {graph.round_trips}")
+            sys.exit(1)
+        saved_trips += old_trips - 1
+    print(f"{CASES} cases match; {saved_trips} Neo4j round trips saved")
+
+
+if __name__ == "__main__":
+    main()
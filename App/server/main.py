@@ -7,9 +7,12 @@ from flask_socketio import SocketIO
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 import json
+import os
 
+from .utils.semantic_cache import literal_key
 from .utils import (
-    MessageStore, GPTInstance, ActionAgent, Chains, ActionsList, DatabaseList
+    MessageStore, GPTInstance, ActionAgent, Chains, ActionsList, DatabaseList, SQLiteLLMCache, SemanticCache,
+    ActionEmbeddingIndex, ResponseGate
 )
 from .routes.socketio_routes import register_socketio_handlers
 from .routes.api_routes import create_api_routes
@@ -24,18 +27,41 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 app.secret_key = 'random secret key!'
 
 # Initialize core components
-message_store = MessageStore()
 llm_instance = ChatOpenAI(model="gpt-4o", temperature=0)
-chain_instance = Chains(llm_instance)
-gpt_instance = GPTInstance(llm_instance, chain_instance, debug=True)
+llm_cache = SQLiteLLMCache(os.path.join(os.path.dirname(__file__), "cache", "llm_cache.sqlite"))
+chain_instance = Chains(llm_instance, llm_cache=llm_cache)
+# Prompts see a running summary of older transcript lines plus the latest ones
+message_store = MessageStore(summarizer=chain_instance.summarize_history)
 
 with open("server/text_db/db.txt", 'r') as db_file:
     database_list = json.load(db_file)
 db_instance = DatabaseList(database_list)
 
+# Cross-session answers, dropped whenever the graph or the CSV catalog changes.
+# A hit also needs the same value tokens and graph entities, so a question
+# about one customer or shop is never answered with another one's data
+semantic_cache = SemanticCache(
+    chain_instance.embeddings,
+    version_fn=lambda: (db_instance.version, chain_instance.graph_version()),
+    key_fn=lambda query: literal_key(query) | {e.lower() for e in chain_instance.entity_matcher.find(query)}
+)
+# Decides locally whether a transcript line needs a response; thresholds,
+# shadow mode and the opt-in decision log come from GATE_* environment variables
+response_gate = ResponseGate(
+    model_path=os.path.join(os.path.dirname(__file__), "cache", "response_gate.npz"),
+    log_path=os.path.join(os.path.dirname(__file__), "cache", "response_gate_decisions.jsonl")
+)
+gpt_instance = GPTInstance(llm_instance, chain_instance, debug=True, semantic_cache=semantic_cache,
+                           response_gate=response_gate)
+
 with open("server/text_db/actions.txt", 'r') as act_file:
     actions_list = json.load(act_file)
 actions_instance = ActionsList(actions_list)
+action_vectors = ActionEmbeddingIndex(
+    chain_instance.embeddings,
+    actions_instance,
+    path=os.path.join(os.path.dirname(__file__), "cache", "action_vectors.npz")
+)
 
 action_agent_instance = ActionAgent(
     llm_instance,
@@ -43,14 +69,17 @@ action_agent_instance = ActionAgent(
     actions_instance,
     db_instance,
     gpt_instance,
-    message_store
+    message_store,
+    semantic_cache=semantic_cache,
+    action_vectors=action_vectors
 )
 
 # Register API routes
 #app.register_blueprint(api_bp)
 
 # 🔗 Register API + Socket Routes
-app.register_blueprint(create_api_routes(actions_instance, db_instance))
+app.register_blueprint(create_api_routes(actions_instance, db_instance, socketio=socketio, action_vectors=action_vectors,
+                                        db_router=action_agent_instance.dba.local_router))
 register_socketio_handlers(socketio, gpt_instance, action_agent_instance, message_store, actions_instance)
 
 if __name__ == "__main__":
@@ -74,7 +74,7 @@ def get_messages():
 def demo_custom_api():
     return jsonify(request.json)
 """
-def create_api_routes(actions_instance, db_instance):
+def create_api_routes(actions_instance, db_instance, socketio=None, action_vectors=None, db_router=None):
     api_bp = Blueprint("api", __name__)
 
     @api_bp.route("/api/get-actions", methods=["GET"])
@@ -84,12 +84,12 @@ def create_api_routes(actions_instance, db_instance):
     @api_bp.route("/api/actions", methods=["POST"])
     def post_action_api():
         new_action = request.json
-        return action_service.post_action(actions_instance, new_action)
+        return action_service.post_action(actions_instance, new_action, action_vectors=action_vectors)
 
     @api_bp.route("/api/save-action", methods=["POST"])
     def save_action_api():
         action = request.json
-        result = action_service.save_action_direct(actions_instance, action)
+        result = action_service.save_action_direct(actions_instance, action, action_vectors=action_vectors)
         return jsonify(result)
 
     @api_bp.route("/api/get-databases", methods=["GET"])
@@ -102,7 +102,19 @@ def create_api_routes(actions_instance, db_instance):
         file = request.files.get("database_file")
         if not file:
             return jsonify({"error": "No file provided"}), 400
-        return database_service.post_database(db_instance, file, form_data)
+
+        # Ingest progress goes only to the uploading client's socket; without a
+        # sid the client polls /api/databases/jobs/<job_id> instead
+        sid = form_data.get("sid")
+        on_progress = None
+        if socketio is not None and sid:
+            on_progress = lambda status: socketio.emit("database-ingest-progress", status, to=sid)
+        return database_service.post_database(db_instance, file, form_data, on_progress=on_progress,
+                                              db_router=db_router)
+
+    @api_bp.route("/api/databases/jobs/<job_id>", methods=["GET"])
+    def get_ingest_status_api(job_id):
+        return database_service.get_ingest_status(job_id)
 
     @api_bp.route("/api/get-token", methods=["GET"])
     def get_token():
@@ -1,4 +1,7 @@
 
+import uuid
+import threading
+from flask import request
 from flask_socketio import emit
 #from ..main import socketio, gpt_instance, message_store, action_agent_instance
 from ..services import gpt_service, copilot_service, action_service
@@ -82,16 +85,82 @@ def handle_api_call(data):
     result = action_service.handle_dynamic_api_call(data, actions_instance)
     emit('api-response', result)
 """
+class ResponseStream:
+    """
+    Pushes one AI message to a single client as incremental 'ai-response-delta'
+    events followed by a final 'ai-response-done'.
+
+    Emits go through socketio.emit(to=sid) because deltas may be produced
+    outside the handler's request context (e.g. inside LangGraph nodes).
+    """
+
+    def __init__(self, socketio, sid, session_id):
+        self.socketio = socketio
+        self.sid = sid
+        self.session_id = session_id
+        self.message_id = uuid.uuid4().hex
+        self.seq = 0
+        self.started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Tell the client a message is coming; sent once, before the first
+        delta or the final 'ai-response-done', however many deltas follow.
+        """
+        with self._lock:
+            if self.started:
+                return
+            self.started = True
+        self.socketio.emit('should-generate-message', 1, to=self.sid)
+
+    def delta(self, text):
+        with self._lock:
+            seq = self.seq
+            self.seq += 1
+        self.socketio.emit('ai-response-delta', {
+            'sessionId': self.session_id,
+            'messageId': self.message_id,
+            'seq': seq,
+            'delta': text
+        }, to=self.sid)
+
+    def done(self, ai_message):
+        with self._lock:
+            seq = self.seq
+        self.socketio.emit('ai-response-done', {
+            'sessionId': self.session_id,
+            'messageId': self.message_id,
+            'seq': seq,
+            'aiMessage': ai_message
+        }, to=self.sid)
+
+
 def register_socketio_handlers(socketio, gpt_instance, action_agent_instance, message_store, actions_instance):
 
     from ..services import gpt_service, copilot_service, action_service
 
     @socketio.on('data')
     def handle_data(data):
-        result = gpt_service.process_transcribed_message(data, gpt_instance, action_agent_instance, message_store)
-        if not result.get("skip"):
+        sid = request.sid
+        stream = ResponseStream(socketio, sid, data.get('sessionId')) if data.get('stream') else None
+
+        def send_delta(delta):
+            stream.start()
+            stream.delta(delta)
+
+        def send_ai_response(ai_message):
+            if stream:
+                stream.start()
+                stream.done(ai_message)
+                return
             emit('should-generate-message', 1)
-            emit('ai-response', {'aiMessage': result['aiMessage']})
+            emit('ai-response', {'aiMessage': ai_message})
+
+        result = gpt_service.process_transcribed_message(
+            data, gpt_instance, action_agent_instance, message_store,
+            on_response=send_ai_response, on_delta=send_delta if stream else None)
+        if not result.get("skip"):
             emit('follow-up-questions', {
                 'headerText': result['headerText'],
                 'followUpQuestions': result['followUpQuestions']
@@ -109,7 +178,11 @@ def register_socketio_handlers(socketio, gpt_instance, action_agent_instance, me
 
     @socketio.on('copilot-query')
     def handle_copilot_query(data):
-        result = copilot_service.run_copilot_query(data, action_agent_instance)
+        stream = ResponseStream(socketio, request.sid, data.get('sessionId')) if data.get('stream') else None
+        result = copilot_service.run_copilot_query(
+            data, action_agent_instance, on_delta=stream.delta if stream else None)
+        if stream:
+            stream.done(result.get('output') if isinstance(result, dict) else result)
         emit('copilot-output', result)
 
     @socketio.on('extract')
@@ -16,7 +16,7 @@ def get_actions(actions_list: ActionsList) -> str:
         return json.dumps([])
 
 
-def post_action(actions_list: ActionsList, new_action: dict) -> tuple:
+def post_action(actions_list: ActionsList, new_action: dict, action_vectors=None) -> tuple:
     with open(ACTIONS_FILE, "r") as f:
         try:
             existing = json.load(f)
@@ -39,12 +39,17 @@ def post_action(actions_list: ActionsList, new_action: dict) -> tuple:
     with open(ACTIONS_FILE, "w") as f:
         data_json = json.dumps(existing, indent=4)
         f.write(data_json)
-        actions_list.set_list(existing)
+    # After the file is closed, so the catalog records its final mtime and size
+    actions_list.set_list(existing)
+
+    # Embedded once here rather than on the first query that could match it
+    if action_vectors is not None:
+        action_vectors.add(data)
 
     return data_json, 200
 
 
-def save_action_direct(actions_list: ActionsList, action: dict) -> dict:
+def save_action_direct(actions_list: ActionsList, action: dict, action_vectors=None) -> dict:
     file_path = ACTIONS_FILE
     with open(file_path, "r") as f:
         try:
@@ -56,7 +61,10 @@ def save_action_direct(actions_list: ActionsList, action: dict) -> dict:
 
     with open(file_path, "w") as f:
         json.dump(actions, f, indent=4)
-        actions_list.set_list(actions)
+    actions_list.set_list(actions)
+
+    if action_vectors is not None:
+        action_vectors.add(action)
 
     return action
 
@@ -130,10 +138,7 @@ def handle_dynamic_api_call(data, actions_list: ActionsList) -> dict:
             }
 
         elif api_service == "custom":
-            custom_action = next(
-                action for action in actions_list.get_list()
-                if action.get("action_name") == data['action_name']
-            )
+            custom_action = actions_list.get(data['action_name'])
             endpoint = custom_action.get("api_endpoint")
             requests.post(endpoint, json=data['extracted_inputs'])
 
@@ -20,14 +20,14 @@ def run_copilot_query(data, action_agent_instance):
 import logging
 logger = logging.getLogger(__name__)
 
-def run_copilot_query(data, action_agent_instance):
+def run_copilot_query(data, action_agent_instance, on_delta=None):
     try:
         query = data.get("query")
         session_id = data.get("sessionId")
         if not query:
             return {"error": "Missing 'query' in request"}
         
-        result = action_agent_instance.run_agent(query, session_id=session_id)
+        result = action_agent_instance.run_agent(query, session_id=session_id, on_delta=on_delta)
         return result
     except Exception as e:
         logger.exception("Copilot query failed:")
@@ -1,20 +1,85 @@
 import os
 import json
 import csv
+import logging
+import threading
 from datetime import date
 from werkzeug.datastructures import FileStorage
 from ..utils.data_models import DatabaseList
+from ..utils.columnar import convert_csv
+from ..utils.sql_engine import ingest_csv, table_name_for
+from ..utils.chunked import is_large_table
+from ..utils.ingest import get_ingest_jobs, profile_csv, save_stream
 
+logger = logging.getLogger(__name__)
 
 DB_FILE = "./text_db/db.txt"
 
-def post_database(database_list: DatabaseList, database_file: FileStorage, form_data: dict) -> tuple:
+_db_file_lock = threading.Lock()
+
+
+def _read_db_file() -> list:
     try:
         with open(DB_FILE, "r") as f:
-            db_data = json.load(f)
+            return json.load(f)
     except json.JSONDecodeError:
-        db_data = []
+        return []
+
+
+def _write_db_file(database_list: DatabaseList, db_data: list):
+    with open(DB_FILE, "w") as f:
+        json.dump(db_data, f, indent=4)
+    database_list.set_list(db_data)
+
+
+def _ingest_database(database_list: DatabaseList, entry: dict, save_path: str, progress, db_router=None):
+    """
+    Background part of an upload: profile the file in one chunked pass, build
+    the columnar (and, if requested, SQLite) copies, store the profile in the
+    entry's db.txt record, and embed the table for the local DB router.
+    """
+    profile = profile_csv(save_path, on_progress=lambda fraction: progress(fraction * 0.9))
+
+    # Convert once to the memory-mappable columnar copy the DB agent loads;
+    # the CSV stays the source of truth and is re-converted when it changes.
+    # Tables too large to load are queried in chunks and through SQLite instead.
+    large = is_large_table(save_path)
+    if not large:
+        try:
+            convert_csv(save_path)
+        except Exception as e:
+            logger.warning("[DatabaseService] Columnar conversion failed for %s: %s", save_path, e)
 
+    # SQLite-backed databases are loaded (with indexes) at upload, not at first query
+    if entry["engine"] == "sqlite" or large:
+        try:
+            ingest_csv(save_path, table_name_for(entry))
+        except Exception as e:
+            logger.warning("[DatabaseService] SQLite ingest failed for %s: %s", save_path, e)
+
+    with _db_file_lock:
+        db_data = _read_db_file()
+        for db in db_data:
+            if db.get("content_hash") == entry["content_hash"]:
+                db["profile"] = profile
+        _write_db_file(database_list, db_data)
+
+    # Embedded here rather than on the first query that is routed
+    if db_router is not None:
+        try:
+            db_router.sync()
+        except Exception as e:
+            logger.warning("[DatabaseService] Embedding %s for the DB router failed: %s", save_path, e)
+
+
+def post_database(database_list: DatabaseList, database_file: FileStorage, form_data: dict,
+                  on_progress=None, db_router=None) -> tuple:
+    """
+    Register an uploaded CSV. The file is streamed to disk and hashed, the
+    db.txt entry is written, and profiling/conversion run as a background job
+    whose status is passed to `on_progress`. Re-uploading a file that is
+    already registered is not ingested again.
+    """
     filename = database_file.filename
     if not filename.endswith('.csv'):
         return {"error": "Invalid file format. Only CSV supported."}, 400
@@ -24,29 +89,48 @@ def post_database(database_list: DatabaseList, database_file: FileStorage, form_
     os.makedirs(csv_folder, exist_ok=True)
 
     # Save path for this uploaded file
-    save_path = os.path.join(csv_folder, filename)
-    database_file.save(save_path)
+    save_path = os.path.join(csv_folder, os.path.basename(filename))
+    tmp_path, content_hash = save_stream(database_file.stream, save_path)
 
-    # Extract CSV headers
-    with open(save_path, 'r') as csv_file:
-        reader = csv.reader(csv_file)
-        headers = next(reader)
+    with _db_file_lock:
+        db_data = _read_db_file()
+        duplicate = next((db for db in db_data if db.get("content_hash") == content_hash), None)
+        if duplicate is not None:
+            os.remove(tmp_path)
+            logger.info("[DatabaseService] %s is already registered as %s", filename, duplicate["database_name"])
+            return {"job_id": None, "duplicate_of": duplicate["database_name"], "databases": db_data}, 200
 
-    # Save only relative path (portable)
-    rel_path = os.path.relpath(save_path, start=os.getcwd())
+        os.replace(tmp_path, save_path)
 
-    new_entry = {
-        "database_name": form_data.get("database_name"),
-        "database_description": form_data.get("database_description"),
-        "columns": ", ".join(headers),
-        "database_path": rel_path,
-        "date": date.today().strftime("%d-%m-%Y")
-    }
+        # Extract CSV headers
+        with open(save_path, 'r', newline='') as csv_file:
+            headers = next(csv.reader(csv_file))
 
-    db_data.append(new_entry)
+        # Save only relative path (portable)
+        rel_path = os.path.relpath(save_path, start=os.getcwd())
+
+        new_entry = {
+            "database_name": form_data.get("database_name"),
+            "database_description": form_data.get("database_description"),
+            "columns": ", ".join(headers),
+            "database_path": rel_path,
+            "date": date.today().strftime("%d-%m-%Y"),
+            "engine": "sqlite" if form_data.get("engine") == "sqlite" else "pandas",
+            "content_hash": content_hash
+        }
+        db_data.append(new_entry)
+        _write_db_file(database_list, db_data)
+
+    job_id = get_ingest_jobs().submit(
+        new_entry["database_name"] or filename,
+        lambda progress: _ingest_database(database_list, new_entry, save_path, progress, db_router=db_router),
+        on_update=on_progress
+    )
+    return {"job_id": job_id, "duplicate_of": None, "databases": db_data}, 202
 
-    with open(DB_FILE, "w") as f:
-        json.dump(db_data, f, indent=4)
-        database_list.set_list(db_data)
 
-    return json.dumps(db_data, indent=4), 200
+def get_ingest_status(job_id: str) -> tuple:
+    status = get_ingest_jobs().get(job_id)
+    if status is None:
+        return {"error": "Unknown job id"}, 404
+    return status, 200
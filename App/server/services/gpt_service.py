@@ -6,12 +6,16 @@ from ..utils.data_models import ActionsList, DatabaseList
 from ..utils.action_agent import ActionAgent
 
 
-def process_transcribed_message(data, gpt_instance: GPTInstance, action_agent: ActionAgent, message_store: MessageStore):
+def process_transcribed_message(data, gpt_instance: GPTInstance, action_agent: ActionAgent, message_store: MessageStore,
+                                on_response=None, on_delta=None):
     """
     Handles incoming 'data' from SocketIO when a new message is transcribed.
 
     Args:
         data: dict with keys 'sessionId', 'transcribedList'
+        on_response: optional callback receiving the AI response before the
+            follow-up and tangential questions are ready
+        on_delta: optional callback receiving the AI response token by token
     """
     session_id = data['sessionId']
     new_message = data['transcribedList'][-1]
@@ -27,20 +31,8 @@ def process_transcribed_message(data, gpt_instance: GPTInstance, action_agent: A
     if not response_needed:
         return {"skip": True}
 
-    # Use ActionAgent to check for action routing
-    action_result = action_agent.actions_router_node({
-        'query': new_message['text'],
-        'verbose': True
-    })
-
-    # If no matching action is found, fallback to GPT processing
-    if action_result.get('actions') == "fallback_to_ai":
-        [ai_response, follow_ups, tangents] = gpt_instance.process_message(
-            new_message['text'], message_store, session_id)
-    else:
-        # Even if action found, still use GPT for response generation
-        [ai_response, follow_ups, tangents] = gpt_instance.process_message(
-            new_message['text'], message_store, session_id)
+    [ai_response, follow_ups, tangents] = gpt_instance.process_message(
+        new_message['text'], message_store, session_id, on_response=on_response, on_delta=on_delta)
 
     message_store.add_ai_message({
         'sessionId': session_id,
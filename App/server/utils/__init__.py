@@ -7,3 +7,12 @@ from .message_store import MessageStore
 from .action_agent import ActionAgent, DBAgent
 from .helpers import generate_full_text_query
 from .data_models import ActionsList, DatabaseList, Entities
+from .llm_cache import SQLiteLLMCache
+from .semantic_cache import SemanticCache
+from .frame_cache import FrameCache, get_frame_cache
+from .sql_engine import SQLAgentGPTInstance
+from .plan_cache import PlanCache
+from .csv_pool import CSVWorkerPool
+from .db_router import EmbeddingDBRouter
+from .action_embeddings import ActionEmbeddingIndex
+from .response_gate import ResponseGate
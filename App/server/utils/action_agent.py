@@ -1,13 +1,24 @@
+import json
 import logging
+import threading
+from collections import OrderedDict
 from typing import List
 from typing_extensions import TypedDict
 
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import AIMessage
-from .csv_agent import CSVAgentGPTInstance
+from langchain_core.runnables import RunnableConfig
+from .csv_pool import CSVWorkerPool
+from .sql_engine import SQLAgentGPTInstance
+from .columnar import load_table
+from .frame_cache import get_frame_cache
+from .fast_query import try_fast_query, try_fast_query_chunked, try_table_query_chunked
+from .chunked import is_large_table
+from .db_router import EmbeddingDBRouter
+from .action_index import ActionIndex, stem, terms
 from .message_store import MessageStore
 from .chains import Chains
-from .helpers import generate_full_text_query
+from .helpers import generate_full_text_query, stream_to_callback
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -21,6 +32,10 @@ class DBAgentGraphState(TypedDict):
     database: str
     output: str
     verbose: bool
+    action: dict
+    # Set when the local router matched several tables equally well, so the
+    # question is answered with SQL over all of them
+    join: bool
 
 
 class DBAgent:
@@ -28,23 +43,37 @@ class DBAgent:
         self.llm = llm
         self.chains = chains
         self.database_list = database_list
-        self.multi_db_router_chain = chains.get_multi_db_router_chain(database_list)
-        self.csv_agent = CSVAgentGPTInstance()
+        # Agent runs happen in worker processes with time and memory budgets
+        self.csv_pool = CSVWorkerPool()
+        self.sql_agent = SQLAgentGPTInstance()
+        self.local_router = EmbeddingDBRouter(chains.embeddings, database_list)
         self.initial_check = chains.get_initial_check_chain()
         self.full_response = chains.get_full_response_chain()
         self.general_response = chains.get_general_response_chain()
+        # Compiled graphs are stateless between invocations, so one instance
+        # is shared by every request and thread.
+        self.agent = self.build_workflow()
+
+    @property
+    def multi_db_router_chain(self):
+        # Rebuilt by Chains whenever the database catalog changes
+        return self.chains.get_multi_db_router_chain(self.database_list)
 
     def db_router_node(self, state: DBAgentGraphState):
         logger.info("[DBAgent] Entering db_router_node with query: %s", state["query"])
         query = state["query"]
         if state["verbose"]: logger.info("[DBAgent] Routing query to database")
+        # The LLM router is only consulted when the embedding match is not clear-cut
+        choice = self.local_router.route(query)
+        if choice is not None:
+            return {"database": choice, "join": len(choice) > 1}
         output = self.multi_db_router_chain.invoke({"query": query})
         logger.info("[DBAgent] Routing output: %s", output)
         return {"database": output.get("choice", "NA")}
 
     def db_router_edge(self, state: DBAgentGraphState):
         logger.info("[DBAgent] Evaluating edge for database: %s", state["database"])
-        if not self.database_list.get_list() or state["database"] == "NA":
+        if not self.database_list.snapshot().entries or state["database"] == "NA":
             logger.info("[DBAgent] Falling back to general")
             return "general"
         return "db_query"
@@ -53,16 +82,55 @@ class DBAgent:
         logger.info("[DBAgent] Running database_query for: %s", state["query"])
         query = state["query"]
         db_paths = []
-        for db_name in state["database"]:
-            db_entry = next((db for db in self.database_list.get_list() if db["database_name"] == db_name), None)
+        db_entries = []
+        databases = self.database_list.snapshot()
+        db_names = state["database"]
+        if isinstance(db_names, str):
+            db_names = [db_names]
+        for db_name in db_names:
+            db_entry = databases.get(db_name)
             if db_entry:
                 db_paths.append(db_entry["db_path"])
+                db_entries.append(db_entry)
 
         logger.info("[DBAgent] Found database paths: %s", db_paths)
-        if len(db_paths) == 1:
-            result = self.csv_agent.get_csv_agent_output(db_paths[0], query)
+        # Databases registered with "engine": "sqlite" are answered with SQL,
+        # which also lets questions spanning several of them use joins
+        if state.get("action") and not state.get("join"):
+            # Plain lookups/aggregates over one table need no LLM at all
+            for db_entry in db_entries:
+                if is_large_table(db_entry["db_path"]):
+                    result = try_fast_query_chunked(query, state["action"], db_entry["db_path"])
+                else:
+                    df = get_frame_cache().get_frame(db_entry["db_path"], loader=load_table)
+                    result = try_fast_query(query, state["action"], df)
+                if result is not None:
+                    logger.info("[DBAgent] Fast path result: %s", result)
+                    return {"output": result}
+
+        # Aggregates, group-bys and top-k over one large table are streamed
+        # through the CSV instead of loading it into SQLite first
+        if len(db_entries) == 1 and is_large_table(db_entries[0]["db_path"]):
+            result = try_table_query_chunked(query, db_entries[0]["db_path"],
+                                             [db_entries[0].get("database_name") or ""])
+            if result is not None:
+                logger.info("[DBAgent] Chunked table query result: %s", result)
+                return {"output": result}
+
+        # Questions touching a table too large for a DataFrame also go to SQLite,
+        # which is loaded from the CSV chunk by chunk, as do questions the router
+        # matched to several tables, which may need a join
+        use_sql = state.get("join") or all(db.get("engine") == "sqlite" for db in db_entries) or any(
+            is_large_table(db["db_path"]) for db in db_entries
+        )
+        if db_entries and use_sql:
+            result = self.sql_agent.get_sql_agent_output(db_entries, query)
+        elif len(db_paths) == 1:
+            result = self.csv_pool.get_csv_agent_output(db_paths[0], query)
+        elif db_paths:
+            result = self.csv_pool.get_multi_csv_agent_output(db_entries, query)
         else:
-            result = self.csv_agent.get_csv_agent_output(db_paths, query)
+            result = {"output": "I couldn't find the selected databases."}
 
         logger.info("[DBAgent] Database query result: %s", result)
         return {"output": result}
@@ -96,10 +164,9 @@ class DBAgent:
 
         return workflow.compile()
 
-    def run_agent(self, query: str, session_id=None, verbose=True):
+    def run_agent(self, query: str, session_id=None, verbose=True, action=None):
         logger.info("[DBAgent] Running agent for query: %s", query)
-        agent = self.build_workflow()
-        result = agent.invoke({"query": query, "verbose": verbose, "sessionId": session_id})
+        result = self.agent.invoke({"query": query, "verbose": verbose, "sessionId": session_id, "action": action})
         logger.info("[DBAgent] Agent result: %s", result)
         return result
 
@@ -108,9 +175,20 @@ class DBAgent:
 # Action Agent
 # ---------------------------
 
+FINAL_OUTPUT_CACHE_SIZE = 256
+ACTION_ROUTER_TOP_K = 2
+# Query terms that mark a request to call an external API rather than query data
+API_KEYWORDS = frozenset(stem(w) for w in ("create", "send", "email", "schedule"))
+
+
+def get_delta_callback(config: RunnableConfig):
+    return ((config or {}).get("configurable") or {}).get("on_delta")
+
 class ActionAgentGraphState(TypedDict):
     query: str
+    sessionId: str
     actions: str
+    selected_actions: List[dict]
     actions_prompts: List[str]
     query_output: List[str]
     output: str
@@ -118,56 +196,73 @@ class ActionAgentGraphState(TypedDict):
 
 
 class ActionAgent:
-    def __init__(self, llm, chains: Chains, actions_list, database_list, gpt_instance, message_store: MessageStore):
+    def __init__(self, llm, chains: Chains, actions_list, database_list, gpt_instance, message_store: MessageStore,
+                 semantic_cache=None, action_vectors=None):
         self.llm = llm
         self.chains = chains
         self.actions_list = actions_list
         self.database_list = database_list
         self.gpt = gpt_instance
         self.store = message_store
+        self.semantic_cache = semantic_cache
+        # ActionEmbeddingIndex; without it actions are picked by the keyword index alone
+        self.action_vectors = action_vectors
 
-        self.action_router = chains.get_action_router_chain(actions_list)
         self.generate_prompt = chains.get_generate_action_prompt_chain()
         self.extract_api_input = chains.get_api_extract_input_chain()
         self.dba = DBAgent(llm, chains, database_list)
+        self._action_index = None
+        self._final_output_cache = OrderedDict()
+        self._final_output_lock = threading.Lock()
+        self.agent = self.build_workflow()
+
+    @property
+    def action_router(self):
+        # Rebuilt by Chains whenever the action catalog changes
+        return self.chains.get_action_router_chain(self.actions_list)
+
+    @property
+    def action_index(self):
+        # Rebuilt once per catalog version, then shared by every query
+        snapshot = self.actions_list.snapshot()
+        index = self._action_index
+        if index is None or index.version != snapshot.version:
+            index = ActionIndex(snapshot.entries, version=snapshot.version)
+            self._action_index = index
+        return index
 
     def actions_router_node(self, state):
         logger.info("[ActionAgent] Routing query: %s", state["query"])
-        query = state["query"].lower()
-        actions = self.actions_list.get_list()
-
-        def relevance_score(action):
-            score = 0
-            if any(word in query for word in action["action_name"].lower().split()):
-                score += 2
-            for word in action["action_description"].lower().split():
-                if word in query:
-                    score += 1
-            for param in action["input"]:
-                if param.lower() in query:
-                    score += 2
-            return score
-
-        matches = sorted([(a, relevance_score(a)) for a in actions], key=lambda x: x[1], reverse=True)
-        matches = [a for a, s in matches if s >= 2]
-        logger.info("[ActionAgent] Matched actions: %s", matches)
-
-        api_keywords = ['create', 'send', 'email', 'schedule']
-        if any(k in query for k in api_keywords):
+        query = state["query"]
+
+        route = self.action_vectors.route(query, k=ACTION_ROUTER_TOP_K) if self.action_vectors else None
+        if route is not None:
+            branch, selected = route
+            logger.info("[ActionAgent] Embedding route: %s %s", branch, [a["action_name"] for a in selected])
+            return {"actions": branch, "selected_actions": [dict(a) for a in selected]}
+
+        matches = self.action_index.search(query, k=ACTION_ROUTER_TOP_K)
+        logger.info("[ActionAgent] Matched actions: %s", [(a["action_name"], round(s, 2)) for a, s in matches])
+
+        # "email" or "send" only makes this an API call when an API action matched;
+        # otherwise it is a database question ("What is John Doe's email?")
+        api_actions = [dict(a) for a, _ in matches if a.get("action_type") == "api_call"]
+        if api_actions and API_KEYWORDS.intersection(terms(query)):
             logger.info("[ActionAgent] Detected API-type query")
-            return {"actions": "api_type_node"}
+            return {"actions": "api_type_node", "selected_actions": api_actions[:1]}
 
         if matches:
             return {
                 "actions": "generate_action_prompt",
-                "selected_actions": matches[:2]  # Top 2
+                "selected_actions": [dict(a) for a, _ in matches]
             }
 
         return {"actions": "fallback_to_ai"}
 
-    def fallback_response(self, state):
+    def fallback_response(self, state, config: RunnableConfig = None):
         logger.info("[ActionAgent] Fallback response for: %s", state["query"])
-        response = self.gpt.process_message(state["query"], self.store, state.get("sessionId", ""))
+        response = self.gpt.process_message(state["query"], self.store, state.get("sessionId", ""),
+                                            on_delta=get_delta_callback(config))
         logger.info("[ActionAgent] Fallback response result: %s", response)
         return {
             "output": response[0],
@@ -179,7 +274,7 @@ class ActionAgent:
         logger.info("[ActionAgent] Determining next edge for actions: %s", state["actions"])
         if state["actions"] == "fallback_to_ai":
             return "fallback"
-        if not self.actions_list.get_list() or state["actions"] == "NA":
+        if not self.actions_list.snapshot().entries or state["actions"] == "NA":
             return "general"
         return "api_type_node" if "api_type_node" in state["actions"] else "generate_action_prompt"
 
@@ -199,7 +294,9 @@ class ActionAgent:
 
     def api_type_node(self, state):
         logger.info("[ActionAgent] Handling API type node for actions: %s", state["actions"])
-        selected = next((a for a in self.actions_list.get_list() if a["action_name"] in state["actions"]), None)
+        selected = next(iter(state.get("selected_actions") or []), None) or next(
+            (a for a in self.actions_list.snapshot().entries if a["action_name"] in state["actions"]), None
+        )
         extracted = self.extract_api_input.invoke({
             "query": state["query"],
             "action_name": selected["action_name"],
@@ -221,19 +318,27 @@ class ActionAgent:
         logger.info("[ActionAgent] Executing DB query")
         if not state.get("actions_prompts"):
             return {"query_output": [self.dba.run_agent(state["query"])]}
-        results = [self.dba.run_agent(prompt) for prompt in state["actions_prompts"]]
+        # Prompts are generated one per selected action, in the same order
+        actions = state.get("selected_actions") or []
+        results = [
+            self.dba.run_agent(prompt, action=actions[i] if i < len(actions) else None)
+            for i, prompt in enumerate(state["actions_prompts"])
+        ]
         logger.info("[ActionAgent] DB query results: %s", results)
         return {"query_output": results}
 
-    def generate_final_output(self, state):
+    def generate_final_output(self, state, config: RunnableConfig = None):
         logger.info("[ActionAgent] Generating final output")
 
+        on_delta = get_delta_callback(config)
         query_output = state.get("query_output")
 
         # 🔒 If no query_output, fallback to output directly
         if not query_output:
             fallback_response = state.get("output") or "~ I'm not sure how to help with that."
             logger.info("[ActionAgent] Using fallback output: %s", fallback_response)
+            if on_delta:
+                on_delta(fallback_response)
             return {"output": fallback_response}
 
         # Normalize to list
@@ -246,7 +351,7 @@ class ActionAgent:
             if isinstance(val, dict):
                 outputs.append(val)
             elif isinstance(val, str):
-                outputs.append({"answer": val})  # 👈 compatibility with prompt
+                outputs.append({"output": val})  # 👈 compatibility with prompt
             else:
                 logger.warning("[ActionAgent] Skipping unexpected output type: %s", type(val))
 
@@ -255,15 +360,31 @@ class ActionAgent:
         if not outputs:
             raise ValueError("Received empty outputs list in final output chain.")
 
+        cache_key = (state["query"], json.dumps(outputs, sort_keys=True, default=str))
+        with self._final_output_lock:
+            cached = self._final_output_cache.get(cache_key)
+            if cached is not None:
+                self._final_output_cache.move_to_end(cache_key)
+                logger.info("[ActionAgent] Reusing memoised final output")
+                if on_delta:
+                    on_delta(cached)
+                return {"output": cached}
+
         final_chain = self.chains.get_final_output_chain(outputs)
-        result = final_chain.invoke({"query": state["query"]})
+        if on_delta:
+            result = stream_to_callback(final_chain, {"query": state["query"]}, on_delta)
+        else:
+            result = final_chain.invoke({"query": state["query"]})
 
         logger.info("[ActionAgent] Final result: %s", result)
 
         # ✅ Wrap result in dict (LangGraph expects this)
-        if isinstance(result, AIMessage):
-            return {"output": result.content}
-        return {"output": str(result)}
+        output = result.content if isinstance(result, AIMessage) else str(result)
+        with self._final_output_lock:
+            self._final_output_cache[cache_key] = output
+            if len(self._final_output_cache) > FINAL_OUTPUT_CACHE_SIZE:
+                self._final_output_cache.popitem(last=False)
+        return {"output": output}
 
 
     def build_workflow(self):
@@ -292,24 +413,44 @@ class ActionAgent:
 
         return workflow.compile()
 
-    def run_agent(self, query: str, session_id=None, verbose=True):
+    def run_agent(self, query: str, session_id=None, verbose=True, on_delta=None):
         logger.info("[ActionAgent] Running agent for query: %s", query)
 
-        agent = self.build_workflow()
+        vector = None
+        if self.semantic_cache is not None:
+            cached, vector = self.semantic_cache.lookup("copilot", query)
+            if cached is not None:
+                if on_delta:
+                    on_delta(cached)
+                return {
+                    "query": query,
+                    "actions": "semantic_cache",
+                    "actions_prompts": [],
+                    "query_output": None,
+                    "output": cached,
+                    "verbose": verbose
+                }
+
         state = {
             "query": query,
             "verbose": verbose,
             "sessionId": session_id
         }
 
-        result = agent.invoke(state)
+        # on_delta reaches the nodes through the run config, not the graph state
+        result = self.agent.invoke(state, config={"configurable": {"on_delta": on_delta}})
         logger.debug("[ActionAgent] Raw agent result: %s", result)
 
-        # Generate final output from collected intermediate state
-        output = self.generate_final_output(result)
+        # The graph always ends in generate_final_output / api_type_node /
+        # fallback, so its final state already holds the answer.
+        output = result.get("output")
 
         logger.info("[ActionAgent] Final result: %s", output)
 
+        # API-call cards are built per request; only cache plain text answers
+        if self.semantic_cache is not None and isinstance(output, str):
+            self.semantic_cache.update("copilot", query, output, vector)
+
         return {
             "query": query,
             "actions": result.get("actions", "unknown"),
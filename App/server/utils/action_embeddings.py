@@ -0,0 +1,194 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Used until the catalog is large enough to calibrate against
+DEFAULT_MATCH_THRESHOLD = 0.80
+MIN_MATCH_THRESHOLD = 0.70
+# Actions needed before the threshold is calibrated from the catalog itself
+CALIBRATION_MIN_ACTIONS = 5
+# A match must beat this share of the similarities between a question written
+# for one action and every other action
+CALIBRATION_PERCENTILE = 95
+API_ACTION_TYPE = "api_call"
+
+
+def action_text(action) -> str:
+    return (
+        f"Action name: {action.get('action_name', '')}\n"
+        f"Description: {action.get('action_description', '')}\n"
+        f"Inputs: {', '.join(action.get('input') or [])}\n"
+        f"Outputs: {', '.join(action.get('output') or [])}"
+    )
+
+
+def query_text(action) -> str:
+    """
+    A question of the kind a user asks for `action`, phrased like the prompts
+    generate_action_prompt writes. Queries are scored against action texts, so
+    the threshold is calibrated on these rather than on action-to-action
+    similarity, which runs much higher.
+    """
+    outputs = ", ".join(action.get("output") or [])
+    inputs = ", ".join(action.get("input") or [])
+    if not outputs or not inputs:
+        return action.get("action_description") or action.get("action_name", "")
+    return f"Give me the {outputs} for {inputs}."
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class ActionEmbeddingIndex:
+    """
+    Action embeddings kept in one NumPy matrix, so matching a query against
+    the whole catalog is a single matrix-vector product and no prompt grows
+    with the number of actions.
+
+    Actions are embedded when they are saved (`add`). Vectors are persisted in
+    an .npz file keyed by a hash of the embedded text, so a restart only embeds
+    actions that are new or were edited by hand.
+
+    The match threshold is calibrated from the catalog: each action also gets
+    a query-like text (`query_text`), and the threshold sits at the
+    CALIBRATION_PERCENTILE of the similarities between those texts and the
+    other actions, which is how close an unrelated action looks to a real
+    query. It is never below MIN_MATCH_THRESHOLD.
+    """
+
+    def __init__(self, embeddings, actions_list, path: str = None):
+        self.embeddings = embeddings
+        self.actions_list = actions_list
+        self.path = path
+        self.version = None
+        self.threshold = DEFAULT_MATCH_THRESHOLD
+        self._vectors = {}  # text hash -> unit vector
+        self._index = ([], None)  # (actions, matrix), swapped as one tuple
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                self._vectors = dict(zip(json.loads(str(data["hashes"])), data["vectors"]))
+            logger.info("[ActionEmbeddings] Loaded %d stored vectors", len(self._vectors))
+        except Exception as e:
+            logger.warning("[ActionEmbeddings] Could not read %s, re-embedding: %s", self.path, e)
+
+    def _save(self):
+        if not self.path:
+            return
+        hashes = list(self._vectors)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".npz", dir=os.path.dirname(self.path))
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, hashes=json.dumps(hashes), vectors=np.stack([self._vectors[h] for h in hashes]))
+        os.replace(tmp_path, self.path)
+
+    def _embed_missing(self, texts: List[str]) -> bool:
+        missing = list(dict.fromkeys(t for t in texts if _hash(t) not in self._vectors))
+        if not missing:
+            return False
+        logger.info("[ActionEmbeddings] Embedding %d action(s)", len(missing))
+        vectors = _unit(np.asarray(self.embeddings.embed_documents(missing), dtype=np.float32))
+        for text, vector in zip(missing, vectors):
+            self._vectors[_hash(text)] = vector
+        return True
+
+    def add(self, action: dict):
+        """
+        Embed a newly saved action right away, so the first query that needs
+        it does not pay for the embedding.
+        """
+        try:
+            with self._lock:
+                if self._embed_missing([action_text(action), query_text(action)]):
+                    self._save()
+        except Exception as e:
+            logger.warning("[ActionEmbeddings] Could not embed %s: %s", action.get("action_name"), e)
+
+    def sync(self):
+        snapshot = self.actions_list.snapshot()
+        if snapshot.version == self.version:
+            return
+        with self._lock:
+            if snapshot.version == self.version:
+                return
+            actions = list(snapshot.entries)
+            texts = [action_text(a) for a in actions]
+            queries = [query_text(a) for a in actions]
+            changed = self._embed_missing(texts + queries)
+            current = {_hash(t) for t in texts + queries}
+            if set(self._vectors) - current:
+                # Vectors of deleted or edited actions
+                self._vectors = {h: v for h, v in self._vectors.items() if h in current}
+                changed = True
+            if changed and self._vectors:
+                self._save()
+            matrix = np.stack([self._vectors[_hash(t)] for t in texts]) if texts else None
+            probes = np.stack([self._vectors[_hash(q)] for q in queries]) if queries else None
+            self.threshold = self._calibrate(matrix, probes)
+            self._index = (actions, matrix)
+            self.version = snapshot.version
+            logger.info("[ActionEmbeddings] %d actions indexed, threshold %.3f", len(actions), self.threshold)
+
+    @staticmethod
+    def _calibrate(matrix: Optional[np.ndarray], probes: Optional[np.ndarray]) -> float:
+        if matrix is None or len(matrix) < CALIBRATION_MIN_ACTIONS:
+            return DEFAULT_MATCH_THRESHOLD
+        # Row i: the question written for action i against every action
+        similarities = probes @ matrix.T
+        impostors = similarities[~np.eye(len(matrix), dtype=bool)]
+        return max(MIN_MATCH_THRESHOLD, float(np.percentile(impostors, CALIBRATION_PERCENTILE)))
+
+    def match(self, query: str, k: int = 2) -> Optional[List[Tuple[dict, float]]]:
+        """
+        Actions scoring at or above the threshold, best first (at most k).
+        Returns None when matching is unavailable (no actions or embedding
+        failure) so the caller can use another router.
+        """
+        try:
+            self.sync()
+            actions, matrix = self._index
+            if matrix is None:
+                return None
+            query_vector = _unit(np.asarray(self.embeddings.embed_query(query), dtype=np.float32))
+        except Exception as e:
+            logger.warning("[ActionEmbeddings] Matching unavailable: %s", e)
+            return None
+
+        scores = matrix @ query_vector
+        top = np.argsort(-scores)[:k]
+        return [(actions[i], float(scores[i])) for i in top if scores[i] >= self.threshold]
+
+    def route(self, query: str, k: int = 2):
+        """
+        ("api_type_node", [action]) when the best match is an API action,
+        ("generate_action_prompt", actions) for database actions, or None
+        when nothing clears the threshold or matching is unavailable, so the
+        keyword index decides.
+        """
+        matches = self.match(query, k)
+        if not matches:
+            return None
+        best = matches[0][0]
+        if best.get("action_type") == API_ACTION_TYPE:
+            return "api_type_node", [best]
+        return "generate_action_prompt", [a for a, _ in matches if a.get("action_type") != API_ACTION_TYPE]
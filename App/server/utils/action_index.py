@@ -0,0 +1,97 @@
+import math
+import heapq
+import logging
+from collections import Counter, defaultdict
+from typing import List, Sequence, Tuple
+
+from .helpers import tokenize
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Term-frequency weight of each field; names and inputs count double, as the
+# keyword scorer this replaces did
+FIELD_WEIGHTS = {"action_name": 2, "action_description": 1, "input": 2}
+# Lowest score that counts as a match
+ACTION_MIN_SCORE = 1.5
+
+# Longest suffixes first; a suffix is only removed when at least three
+# characters remain
+SUFFIXES = (
+    ("ational", "ate"), ("ization", "ize"), ("fulness", "ful"), ("iveness", "ive"),
+    ("ations", "ate"), ("ation", "ate"), ("ments", ""), ("ment", ""), ("ingly", ""),
+    ("ings", ""), ("ing", ""), ("edly", ""), ("ies", "y"), ("ied", "y"), ("sses", "ss"),
+    ("ers", ""), ("er", ""), ("ed", ""), ("ly", ""), ("es", ""), ("s", ""),
+)
+
+
+def stem(word: str) -> str:
+    """
+    Light suffix-stripping stemmer: "purchase", "purchases" and "purchasing"
+    all become "purchas"; "categories" becomes "category".
+    """
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == "s" and word.endswith(("ss", "us", "is")):
+                break
+            word = word[: len(word) - len(suffix)] + replacement
+            break
+    # "purchase" and "purchases" both end up as "purchas"
+    if len(word) >= 4 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def terms(text: str) -> List[str]:
+    return [stem(t) for t in tokenize(text)]
+
+
+def _field_text(action, field: str) -> str:
+    value = action.get(field) or ""
+    return " ".join(value) if isinstance(value, (list, tuple)) else str(value)
+
+
+class ActionIndex:
+    """
+    Inverted index over action names, descriptions and inputs with BM25
+    weights. Built once per catalog version; a search only visits the posting
+    lists of the query's terms.
+    """
+
+    def __init__(self, actions: Sequence, version=None, k1: float = BM25_K1, b: float = BM25_B):
+        self.version = version
+        self.actions = list(actions)
+        postings = defaultdict(list)  # term -> [(action index, weighted tf)]
+        lengths = []
+        for i, action in enumerate(self.actions):
+            tf = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                for term in terms(_field_text(action, field)):
+                    tf[term] += weight
+            lengths.append(sum(tf.values()))
+            for term, count in tf.items():
+                postings[term].append((i, count))
+
+        n = len(self.actions)
+        avg_length = (sum(lengths) / n) if n else 0.0
+        # Precompute each posting's final BM25 contribution
+        self.postings = {}
+        for term, entries in postings.items():
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            self.postings[term] = [
+                (i, idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[i] / avg_length)))
+                for i, tf in entries
+            ]
+        logger.info("[ActionIndex] Indexed %d actions, %d terms (version %s)", n, len(self.postings), version)
+
+    def search(self, query: str, k: int = 2, min_score: float = ACTION_MIN_SCORE) -> List[Tuple[object, float]]:
+        scores = defaultdict(float)
+        for term in set(terms(query)):
+            for i, weight in self.postings.get(term, ()):
+                scores[i] += weight
+        best = heapq.nlargest(k, ((s, -i) for i, s in scores.items() if s >= min_score))
+        return [(self.actions[-i], s) for s, i in best]
@@ -0,0 +1,107 @@
+import os
+import json
+import logging
+import threading
+from types import MappingProxyType
+from typing import Callable, Mapping, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class CatalogSnapshot(NamedTuple):
+    """
+    Immutable view of a JSON catalog at a given version.
+    """
+    version: int
+    entries: Tuple[Mapping, ...]
+    by_name: Mapping[str, Mapping]
+
+    def get(self, name: str) -> Optional[Mapping]:
+        return self.by_name.get(name)
+
+
+def _freeze(entry: dict) -> Mapping:
+    return MappingProxyType(dict(entry))
+
+
+class JsonCatalog:
+    """
+    Shared, in-memory copy of a JSON list file (actions.txt / db.txt).
+
+    The parsed list is kept in memory and only re-read when the file's
+    mtime or size changes, or when a new list is pushed through `replace`.
+    Every (re)load bumps `version` so dependants can tell when to rebuild.
+    """
+
+    def __init__(self, path: str, key: str, normalise: Optional[Callable[[dict], dict]] = None):
+        self.path = path
+        self.key = key
+        self.normalise = normalise
+        self._lock = threading.Lock()
+        self._stat = None
+        self._snapshot = CatalogSnapshot(0, (), MappingProxyType({}))
+
+    def _file_stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _build(self, data: list) -> CatalogSnapshot:
+        entries = []
+        for item in data:
+            if self.normalise:
+                item = self.normalise(dict(item))
+            entries.append(_freeze(item))
+        by_name = {e[self.key]: e for e in entries if e.get(self.key)}
+        return CatalogSnapshot(self._snapshot.version + 1, tuple(entries), MappingProxyType(by_name))
+
+    def snapshot(self) -> CatalogSnapshot:
+        stat = self._file_stat()
+        if stat is not None and stat == self._stat:
+            return self._snapshot
+
+        with self._lock:
+            stat = self._file_stat()
+            if stat is None or stat == self._stat:
+                return self._snapshot
+            try:
+                logger.info("[JsonCatalog] Loading catalog from: %s", self.path)
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                self._snapshot = self._build(data)
+                self._stat = stat
+                logger.info("[JsonCatalog] Loaded %d entries (version %d)", len(data), self._snapshot.version)
+            except Exception as e:
+                logger.error("[JsonCatalog] Failed to load catalog %s: %s", self.path, e)
+            return self._snapshot
+
+    def replace(self, data: list) -> CatalogSnapshot:
+        with self._lock:
+            self._snapshot = self._build(data)
+            self._stat = self._file_stat()
+            logger.info("[JsonCatalog] Replaced %s with %d entries (version %d)", self.path, len(data), self._snapshot.version)
+            return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self.snapshot().version
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(path: str, key: str, normalise: Optional[Callable[[dict], dict]] = None) -> JsonCatalog:
+    """
+    Return the process-wide catalog for `path`, creating it on first use.
+    """
+    path = os.path.abspath(path)
+    with _catalogs_lock:
+        catalog = _catalogs.get(path)
+        if catalog is None:
+            catalog = JsonCatalog(path, key, normalise)
+            _catalogs[path] = catalog
+        return catalog
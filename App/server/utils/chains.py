@@ -1,5 +1,10 @@
 import json
+import time
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import wraps
 from typing import List
 
 from langchain_core.messages import AIMessage
@@ -16,27 +21,131 @@ from langchain_neo4j import Neo4jGraph, Neo4jVector
 
 from .helpers import generate_full_text_query
 from .data_models import Entities
+from .entity_matcher import EntityMatcher
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Chains whose LLM calls go through the response cache by default. The
+# transcript response chains are left out: their prompts embed the chat
+# history or retrieved context and almost never repeat verbatim.
+CACHED_CHAINS = frozenset({
+    "initial_check",
+    "history_check",
+    "elaboration",
+    "entity",
+    "action_router",
+    "generate_action_prompt",
+    "api_extract_input",
+    "multi_db_router",
+    "general_response",
+    "summary",
+})
+
+STRUCTURED_RETRIEVAL_QUERY = """
+UNWIND $queries AS query
+CALL {
+    WITH query
+    CALL db.index.fulltext.queryNodes('entity', query, {limit: 5})
+    YIELD node, score
+    CALL {
+        WITH node
+        MATCH (node)-[r:!MENTIONS]->(neighbor)
+        RETURN node.id + ' - ' + type(r) + ' -> ' + neighbor.id AS output
+        UNION ALL
+        WITH node
+        MATCH (node)<-[r:!MENTIONS]-(neighbor)
+        RETURN neighbor.id + ' - ' + type(r) + ' -> ' + node.id AS output
+    }
+    RETURN output LIMIT 50
+}
+RETURN DISTINCT output
+"""
+
+# Retrieval deadlines in seconds: per branch, and for the whole context
+RETRIEVAL_TIMEOUTS = {"structured": 4.0, "vector": 3.0}
+RETRIEVAL_BUDGET = 4.0
+RETRIEVAL_WORKERS = 16
+RETRIEVAL_TIMING_WINDOW = 200
+
+# How long a graph fingerprint is trusted before Neo4j is asked again
+GRAPH_VERSION_TTL = 60
+
+
+def registered_chain(build):
+    """
+    Build a chain once and keep it in the Chains registry.
+
+    Any positional arguments are catalogs (ActionsList / DatabaseList); the
+    chain is rebuilt whenever one of their versions changes.
+    """
+    @wraps(build)
+    def getter(self, *catalogs):
+        version = tuple((id(c), c.version) for c in catalogs)
+        entry = self.registry.get(build.__name__)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        with self.registry_lock:
+            entry = self.registry.get(build.__name__)
+            if entry is None or entry[0] != version:
+                entry = (version, build(self, *catalogs))
+                self.registry[build.__name__] = entry
+            return entry[1]
+    return getter
+
+
 class Chains:
-    def __init__(self, llm):
+    def __init__(self, llm, llm_cache=None, cached_chains=CACHED_CHAINS):
         logger.info("[Chains] Initializing Chains class")
         self.llm = llm
+        self.llm_cache = llm_cache
+        self.cached_chains = cached_chains
+        self.cached_llm = llm.model_copy(update={"cache": llm_cache}) if llm_cache is not None else llm
+        self.registry = {}
+        self.registry_lock = threading.RLock()
+        self.retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+        self.retrieval_lock = threading.Lock()
+        self.retrieval_timings = {}
+        self.retrieval_timeouts = {}
         self.graph_db = Neo4jGraph()
+        self.ensure_entity_index()
+        self.embeddings = OpenAIEmbeddings()
+        self._graph_version = None
+        self._graph_version_at = 0.0
+        self.entity_matcher = EntityMatcher(self.graph_db, version_fn=self.graph_version)
         self.vector_index = Neo4jVector.from_existing_graph(
-            OpenAIEmbeddings(),
+            self.embeddings,
             search_type="hybrid",
             node_label="Document",
             text_node_properties=["text"],
             embedding_node_property="embedding"
         )
 
-    def BooleanOutputParser(self, ai_message: AIMessage) -> bool:
+    def graph_version(self):
+        """
+        Cheap fingerprint of the knowledge graph (node and relationship counts),
+        refreshed at most every GRAPH_VERSION_TTL seconds.
+        """
+        now = time.monotonic()
+        if self._graph_version is None or now - self._graph_version_at > GRAPH_VERSION_TTL:
+            try:
+                nodes = self.graph_db.query("MATCH (n) RETURN count(n) AS count")[0]["count"]
+                rels = self.graph_db.query("MATCH ()-[r]->() RETURN count(r) AS count")[0]["count"]
+                self._graph_version = (nodes, rels)
+            except Exception as e:
+                logger.warning(f"[Chains] graph_version failed: {e}")
+            self._graph_version_at = now
+        return self._graph_version
+
+    def llm_for(self, chain_name: str):
+        return self.cached_llm if chain_name in self.cached_chains else self.llm
+
+    def BooleanOutputParser(self, ai_message) -> bool:
         logger.info("[Chains] Parsing boolean output")
         try:
-            return 'yes' in ai_message.content.lower()
+            # The check chains hand over a str after StrOutputParser
+            text = ai_message.content if isinstance(ai_message, AIMessage) else str(ai_message)
+            return 'yes' in text.lower()
         except Exception as e:
             logger.warning(f"[Chains] BooleanOutputParser error: {e}")
             return False
@@ -55,14 +164,16 @@ class Chains:
         return json.dumps([])
 
 
+    @registered_chain
     def get_initial_check_chain(self):
         logger.info("[Chains] Creating initial check chain")
         prompt = ChatPromptTemplate.from_messages([
             SystemMessagePromptTemplate.from_template("You can only answer yes or no."),
             HumanMessagePromptTemplate.from_template("Is the following text a business-related question?\n\nText: {text}")
         ])
-        return prompt | self.llm | StrOutputParser() | self.BooleanOutputParser
+        return prompt | self.llm_for("initial_check") | StrOutputParser() | self.BooleanOutputParser
 
+    @registered_chain
     def get_history_check_chain(self):
         logger.info("[Chains] Creating history check chain")
         prompt = ChatPromptTemplate.from_messages([
@@ -71,25 +182,28 @@ class Chains:
                 "Previous questions: {history}\nLatest question: {text}"
             )
         ])
-        return prompt | self.llm | StrOutputParser() | self.BooleanOutputParser
+        return prompt | self.llm_for("history_check") | StrOutputParser() | self.BooleanOutputParser
 
+    @registered_chain
     def get_elaboration_chain(self):
         logger.info("[Chains] Creating elaboration chain")
         prompt = ChatPromptTemplate.from_messages([
             SystemMessagePromptTemplate.from_template("Please elaborate on the entity in the following text."),
             HumanMessagePromptTemplate.from_template("Text: {text}")
         ])
-        return prompt | self.llm | StrOutputParser()
+        return prompt | self.llm_for("elaboration") | StrOutputParser()
 
+    @registered_chain
     def get_follow_up_questions_chain(self):
         logger.info("[Chains] Creating follow-up questions chain")
-        template = """You are given a full chat history and the latest user question.\n{chat_history}\n\nQuestion: {question}\n[...]"""
+        template = """You are given the chat history (older turns summarised) and the latest user question.\n{chat_history}\n\nQuestion: {question}\n[...]"""
         prompt = ChatPromptTemplate.from_template(template)
         return RunnableParallel({
             "chat_history": lambda x: x["chat_history"],
             "question": lambda x: x["question"],
-        }) | prompt | self.llm | self.safeListOutputParser
+        }) | prompt | self.llm_for("follow_up_questions") | self.safeListOutputParser
 
+    @registered_chain
     def get_tangential_questions_chain(self):
         logger.info("[Chains] Creating tangential questions chain")
         template = """Chat History:\n{chat_history}\n\nLatest Inquiry:\n{question}\n[...]"""
@@ -97,15 +211,43 @@ class Chains:
         return RunnableParallel({
             "chat_history": lambda x: x["chat_history"],
             "question": lambda x: x["question"],
-        }) | prompt | self.llm | self.safeListOutputParser
+        }) | prompt | self.llm_for("tangential_questions") | self.safeListOutputParser
+
+    @registered_chain
+    def get_history_summary_chain(self):
+        logger.info("[Chains] Creating history summary chain")
+        prompt = ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(
+                "You maintain a running summary of a business meeting transcript. Keep the topics, "
+                "questions asked, names, numbers and decisions. Use at most 200 words."
+            ),
+            HumanMessagePromptTemplate.from_template(
+                "Current summary:\n{summary}\n\nNew transcript lines:\n{lines}\n\nUpdated summary:"
+            )
+        ])
+        return RunnableParallel({
+            "summary": lambda x: x["summary"] or "(none yet)",
+            "lines": lambda x: "\n".join(x["lines"]),
+        }) | prompt | self.llm_for("history_summary") | StrOutputParser()
+
+    def summarize_history(self, summary: str, lines: List[str]) -> str:
+        return self.get_history_summary_chain().invoke({"summary": summary, "lines": lines})
 
+    @registered_chain
     def get_entity_chain(self):
         logger.info("[Chains] Creating entity extraction chain")
         prompt = ChatPromptTemplate.from_messages([
             SystemMessagePromptTemplate.from_template("Extract object, event entities from the given text."),
             HumanMessagePromptTemplate.from_template("Text: {text}")
         ])
-        return prompt | self.llm.with_structured_output(Entities)
+        return prompt | self.llm_for("entity").with_structured_output(Entities)
+
+    def ensure_entity_index(self):
+        logger.info("[Chains] Ensuring full-text entity index exists")
+        try:
+            self.graph_db.query("CREATE FULLTEXT INDEX entity IF NOT EXISTS FOR (e:__Entity__) ON EACH [e.id]")
+        except Exception as e:
+            logger.error(f"[Chains] Could not create entity index: {e}")
 
     def structured_retriever(self, entities):
         logger.info("[Chains] Performing structured retrieval for entities: %s", entities)
@@ -114,41 +256,91 @@ class Chains:
             if not entities or not entities.names:
                 logger.warning("[Chains] No entities found or 'names' is None")
                 return result
-            self.graph_db.query("CREATE FULLTEXT INDEX entity IF NOT EXISTS FOR (e:__Entity__) ON EACH [e.id]")
-            for entity in entities.names:
-                response = self.graph_db.query(
-                    """CALL db.index.fulltext.queryNodes('entity', $query, {limit: 5})
-                    YIELD node, score
-                    CALL {
-                        WITH node
-                        MATCH (node)-[r:!MENTIONS]->(neighbor)
-                        RETURN node.id + ' - ' + type(r) + ' -> ' + neighbor.id AS output
-                        UNION ALL
-                        WITH node
-                        MATCH (node)<-[r:!MENTIONS]-(neighbor)
-                        RETURN neighbor.id + ' - ' + type(r) + ' -> ' + node.id AS output
-                    }
-                    RETURN output LIMIT 50""",
-                    {"query": generate_full_text_query(entity)},
-                )
-                logger.info("[Chains] Retrieved structured data for %s: %s", entity, response)
-                result += "\n".join([el['output'] for el in response])
+            queries = [q for q in dict.fromkeys(generate_full_text_query(entity) for entity in entities.names) if q]
+            if not queries:
+                return result
+            # One round trip for every entity; each keeps its own 50-row limit
+            response = self.graph_db.query(STRUCTURED_RETRIEVAL_QUERY, {"queries": queries})
+            logger.info("[Chains] Retrieved structured data for %s: %s", entities.names, response)
+            result = "\n".join(el["output"] for el in response)
         except Exception as e:
             logger.error(f"[Chains] Structured retrieval failed: {e}")
         return result
 
-    def get_context(self, message: str) -> str:
-        logger.info("[Chains] Generating context for message: %s", message)
+    def _timed_branch(self, name, fn, *args):
+        start = time.perf_counter()
         try:
+            return fn(*args)
+        finally:
+            self._record_timing(name, time.perf_counter() - start)
+
+    def _record_timing(self, name, seconds):
+        with self.retrieval_lock:
+            self.retrieval_timings.setdefault(name, deque(maxlen=RETRIEVAL_TIMING_WINDOW)).append(seconds)
+
+    def retrieval_stats(self) -> dict:
+        """
+        Mean / p95 / max latency in ms per retrieval branch over the recent window,
+        plus how often each branch missed its deadline.
+        """
+        with self.retrieval_lock:
+            samples = {name: sorted(values) for name, values in self.retrieval_timings.items()}
+            timeouts = dict(self.retrieval_timeouts)
+        stats = {}
+        for name, values in samples.items():
+            stats[name] = {
+                "count": len(values),
+                "mean_ms": round(1000 * sum(values) / len(values), 1),
+                "p95_ms": round(1000 * values[int(0.95 * (len(values) - 1))], 1),
+                "max_ms": round(1000 * values[-1], 1),
+                "timeouts": timeouts.get(name, 0),
+            }
+        return stats
+
+    def structured_branch(self, message: str) -> str:
+        # The LLM extractor only runs when no known entity is mentioned
+        names = self.entity_matcher.find(message)
+        if names:
+            entities = Entities(names=names)
+        else:
             entities = self.get_entity_chain().invoke({"text": message})
-            logger.info(f"[Chains] Extracted entities: {entities}")
-            structured_data = self.structured_retriever(entities)
-            unstructured_data = [doc.page_content for doc in self.vector_index.similarity_search(message)]
-            return f"""Structured data:\n{structured_data}\n\nUnstructured data:\n{'#Document '.join(unstructured_data)}"""
-        except Exception as e:
-            logger.error(f"[Chains] get_context failed: {e}")
+        logger.info(f"[Chains] Extracted entities: {entities}")
+        return self.structured_retriever(entities)
+
+    def vector_branch(self, message: str) -> List[str]:
+        return [doc.page_content for doc in self.vector_index.similarity_search(message)]
+
+    def get_context(self, message: str) -> str:
+        logger.info("[Chains] Generating context for message: %s", message)
+        # The vector search does not need the extracted entities, so both
+        # branches start together and each gets its own deadline inside
+        # the overall budget. Late branches are left out of the context.
+        start = time.monotonic()
+        futures = {
+            name: self.retrieval_executor.submit(self._timed_branch, name, fn, message)
+            for name, fn in (("structured", self.structured_branch), ("vector", self.vector_branch))
+        }
+        results = {}
+        for name, future in futures.items():
+            deadline = start + min(RETRIEVAL_TIMEOUTS[name], RETRIEVAL_BUDGET)
+            try:
+                results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                logger.warning(f"[Chains] Retrieval branch '{name}' missed its deadline")
+                with self.retrieval_lock:
+                    self.retrieval_timeouts[name] = self.retrieval_timeouts.get(name, 0) + 1
+            except Exception as e:
+                logger.error(f"[Chains] Retrieval branch '{name}' failed: {e}")
+
+        logger.info("[Chains] Context built in %.0f ms from branches: %s",
+                    1000 * (time.monotonic() - start), list(results))
+        if not results:
             return "No relevant context found."
+        structured_data = results.get("structured", "")
+        unstructured_data = results.get("vector", [])
+        return f"""Structured data:\n{structured_data}\n\nUnstructured data:\n{'#Document '.join(unstructured_data)}"""
 
+    @registered_chain
     def get_response_chain(self):
         logger.info("[Chains] Creating response chain")
         template = """Answer the question based only on the following context:\n{context}\n\nQuestion: {question}\nUse point form with '~' bullets."""
@@ -156,8 +348,9 @@ class Chains:
         return RunnableParallel({
             "context": lambda x: self.get_context(x["question"]),
             "question": lambda x: x["question"],
-        }) | prompt | self.llm | StrOutputParser()
+        }) | prompt | self.llm_for("response") | StrOutputParser()
 
+    @registered_chain
     def get_full_response_chain(self):
         logger.info("[Chains] Creating full response chain")
         template = """Answer the question based only on the following context:\n{context}\n\nQuestion: {question}\nAnswer:"""
@@ -165,8 +358,9 @@ class Chains:
         return RunnableParallel({
             "context": lambda x: self.get_context(x["question"]),
             "question": lambda x: x["question"],
-        }) | prompt | self.llm | StrOutputParser()
+        }) | prompt | self.llm_for("full_response") | StrOutputParser()
 
+    @registered_chain
     def get_action_router_chain(self, actions_list):
         logger.info("[Chains] Creating action router chain")
         from langchain_core.prompts import ChatPromptTemplate
@@ -193,8 +387,9 @@ class Chains:
             HumanMessagePromptTemplate.from_template("Query: {query}")
         ])
 
-        return choose_action_prompt | self.llm | JsonOutputParser()
+        return choose_action_prompt | self.llm_for("action_router") | JsonOutputParser()
 
+    @registered_chain
     def get_generate_action_prompt_chain(self):
         logger.info("[Chains] Creating generate action prompt chain")
         from langchain_core.prompts import ChatPromptTemplate, FewShotChatMessagePromptTemplate
@@ -241,8 +436,9 @@ class Chains:
             ("human", "Query: {query}\nAction description: {action_description}\nAction input: {action_input}\nAction output: {action_output}")
         ])
 
-        return main_prompt | self.llm | StrOutputParser()
+        return main_prompt | self.llm_for("generate_action_prompt") | StrOutputParser()
 
+    @registered_chain
     def get_api_extract_input_chain(self):
         logger.info("[Chains] Creating API extract input chain")
         from langchain_core.prompts import ChatPromptTemplate
@@ -264,8 +460,9 @@ class Chains:
             )
         ])
 
-        return prompt | self.llm | JsonOutputParser()
+        return prompt | self.llm_for("api_extract_input") | JsonOutputParser()
 
+    @registered_chain
     def get_multi_db_router_chain(self, database_list):
         logger.info("[Chains] Creating multi DB router chain")
         from langchain_core.prompts import ChatPromptTemplate, FewShotChatMessagePromptTemplate
@@ -295,8 +492,9 @@ class Chains:
             HumanMessagePromptTemplate.from_template("Query: {query}")
         ])
 
-        return router_prompt | self.llm | JsonOutputParser()
+        return router_prompt | self.llm_for("multi_db_router") | JsonOutputParser()
 
+    @registered_chain
     def get_general_response_chain(self):
         logger.info("[Chains] Creating general response chain")
         from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
@@ -318,10 +516,19 @@ class Chains:
             HumanMessagePromptTemplate.from_template("Query: {query}")
         ])
 
-        return general_response_prompt | self.llm | StrOutputParser()
+        return general_response_prompt | self.llm_for("general_response") | StrOutputParser()
 
 
 
+    @registered_chain
+    def get_summary_chain(self):
+        logger.info("[Chains] Creating summary chain")
+        prompt_template = ChatPromptTemplate.from_messages([
+            ("system", "You are a helpful CRM assistant."),
+            ("human", "Here is the database result:\n\n{db_result}\n\nSummarize this for the user.")
+        ])
+        return prompt_template | self.llm_for("summary")
+
     def get_final_output_chain(self, outputs: list):
         logger.info("[Chains] Building final output chain...")
 
@@ -343,14 +550,8 @@ class Chains:
             if not isinstance(db_result, str):
                 raise TypeError(f"[Chains] db_result must be a string, got: {type(db_result)}")
 
-            # Build a prompt template
-            prompt_template = ChatPromptTemplate.from_messages([
-                ("system", "You are a helpful CRM assistant."),
-                ("human", "Here is the database result:\n\n{db_result}\n\nSummarize this for the user.")
-            ])
-
-            # 👇 COMBINE the prompt and LLM into a runnable chain
-            chain = RunnableLambda(lambda _: {"db_result": db_result}) | prompt_template | self.llm
+            # 👇 COMBINE the per-call input with the shared prompt + LLM
+            chain = RunnableLambda(lambda _: {"db_result": db_result}) | self.get_summary_chain()
 
             logger.debug("[Chains] Final output chain created successfully.")
             return chain
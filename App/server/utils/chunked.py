@@ -0,0 +1,266 @@
+import os
+import logging
+from typing import Iterator, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Tables larger than this on disk are queried chunk by chunk instead of being
+# loaded into a DataFrame
+CHUNKED_MODE_BYTES = int(os.getenv("CHUNKED_MODE_BYTES", 512 * 1024 * 1024))
+CHUNK_ROWS = 200_000
+SAMPLE_ROWS = 1000
+
+AGGREGATE_FUNCS = ("sum", "count", "min", "max", "mean")
+
+
+class Filter(NamedTuple):
+    column: str
+    op: str  # ==, !=, <, <=, >, >=, contains, in
+    value: object
+
+
+class Aggregate(NamedTuple):
+    label: str
+    func: str  # one of AGGREGATE_FUNCS
+    column: Optional[str] = None  # count with no column counts rows
+
+
+class TopK(NamedTuple):
+    column: str
+    k: int
+    largest: bool = True
+
+
+class QueryResult(NamedTuple):
+    frame: pd.DataFrame
+    matched_rows: int
+
+
+def is_large_table(path: str, threshold: int = None) -> bool:
+    threshold = CHUNKED_MODE_BYTES if threshold is None else threshold
+    try:
+        return os.path.getsize(path) > threshold
+    except OSError:
+        return False
+
+
+def iter_chunks(csv_path: str, chunk_rows: int = CHUNK_ROWS, columns: Sequence[str] = None) -> Iterator[pd.DataFrame]:
+    return pd.read_csv(csv_path, chunksize=chunk_rows, usecols=list(columns) if columns else None)
+
+
+def sample_frame(csv_path: str, rows: int = SAMPLE_ROWS) -> pd.DataFrame:
+    """
+    The first rows of a table: enough for column names and dtypes.
+    """
+    return pd.read_csv(csv_path, nrows=rows)
+
+
+def filter_mask(frame: pd.DataFrame, filters: Sequence[Filter]) -> np.ndarray:
+    mask = np.ones(len(frame), dtype=bool)
+    for f in filters:
+        series = frame[f.column]
+        if f.op == "==":
+            hit = series == f.value
+        elif f.op == "!=":
+            hit = series != f.value
+        elif f.op == "<":
+            hit = series < f.value
+        elif f.op == "<=":
+            hit = series <= f.value
+        elif f.op == ">":
+            hit = series > f.value
+        elif f.op == ">=":
+            hit = series >= f.value
+        elif f.op == "contains":
+            hit = series.astype(str).str.contains(str(f.value), case=False, regex=False)
+        elif f.op == "in":
+            hit = series.isin(list(f.value))
+        else:
+            raise ValueError(f"Unsupported filter operator: {f.op}")
+        mask &= hit.fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+class PartialAggregates:
+    """
+    Running aggregates over a stream of (already filtered) chunks.
+
+    Every aggregate is reduced to partials that combine associatively: sum and
+    count add up, min and max take the min and max, and mean is carried as a
+    sum and a count. With `group_by`, the partials are kept per group.
+    """
+
+    def __init__(self, aggregates: Sequence[Aggregate], group_by: Sequence[str] = ()):
+        for agg in aggregates:
+            if agg.func not in AGGREGATE_FUNCS:
+                raise ValueError(f"Unsupported aggregate: {agg.func}")
+        self.aggregates = list(aggregates)
+        self.group_by = list(group_by)
+        self.rows = 0
+        self._partials = None
+
+    def _partial_specs(self):
+        # (partial column, source column, reduce-within-chunk, combine-across-chunks)
+        specs = {"__rows__": (None, "size", "sum")}
+        for agg in self.aggregates:
+            if agg.column is None:
+                continue
+            if agg.func in ("sum", "mean"):
+                specs[f"{agg.column}__sum"] = (agg.column, "sum", "sum")
+            if agg.func in ("count", "mean"):
+                specs[f"{agg.column}__count"] = (agg.column, "count", "sum")
+            if agg.func in ("min", "max"):
+                specs[f"{agg.column}__{agg.func}"] = (agg.column, agg.func, agg.func)
+        return specs
+
+    def update(self, frame: pd.DataFrame):
+        self.rows += len(frame)
+        if frame.empty:
+            return
+        specs = self._partial_specs()
+        if self.group_by:
+            grouped = frame.groupby(self.group_by, sort=False)
+            partial = pd.DataFrame({
+                name: grouped.size() if column is None else grouped[column].agg(reduce)
+                for name, (column, reduce, _) in specs.items()
+            })
+            if self._partials is not None:
+                combined = pd.concat([self._partials, partial])
+                partial = combined.groupby(level=list(range(len(self.group_by))), sort=False).agg(
+                    {name: combine for name, (_, _, combine) in specs.items()}
+                )
+            self._partials = partial
+        else:
+            partial = {
+                name: len(frame) if column is None else getattr(frame[column], reduce)()
+                for name, (column, reduce, _) in specs.items()
+            }
+            if self._partials is None:
+                self._partials = partial
+            else:
+                for name, (_, _, combine) in specs.items():
+                    old, new = self._partials[name], partial[name]
+                    if combine == "sum":
+                        self._partials[name] = old + new
+                    elif pd.isna(old):
+                        self._partials[name] = new
+                    elif not pd.isna(new):
+                        self._partials[name] = min(old, new) if combine == "min" else max(old, new)
+
+    def _finish(self, partials, agg: Aggregate):
+        if agg.column is None:
+            return partials["__rows__"]
+        if agg.func == "mean":
+            total, count = partials[f"{agg.column}__sum"], partials[f"{agg.column}__count"]
+            if isinstance(count, pd.Series):
+                return total / count.where(count > 0)
+            return total / count if count else np.nan
+        return partials[f"{agg.column}__{'count' if agg.func == 'count' else agg.func}"]
+
+    def result(self) -> pd.DataFrame:
+        if self.group_by:
+            if self._partials is None:
+                return pd.DataFrame(columns=self.group_by + [a.label for a in self.aggregates])
+            frame = pd.DataFrame({agg.label: self._finish(self._partials, agg) for agg in self.aggregates})
+            return frame.reset_index().sort_values(self.group_by, ignore_index=True)
+        if self._partials is None:
+            values = {agg.label: [0 if agg.func == "count" else np.nan] for agg in self.aggregates}
+            return pd.DataFrame(values)
+        return pd.DataFrame({agg.label: [self._finish(self._partials, agg)] for agg in self.aggregates})
+
+
+class PartialTopK:
+    """
+    Running top-k: each chunk's k best rows are merged with the k kept so far.
+    Ties are broken by file order, as DataFrame.nlargest/nsmallest do.
+    """
+
+    def __init__(self, top_k: TopK):
+        self.top_k = top_k
+        self._rows = None
+
+    def _select(self, frame: pd.DataFrame) -> pd.DataFrame:
+        pick = frame.nlargest if self.top_k.largest else frame.nsmallest
+        return pick(self.top_k.k, self.top_k.column)
+
+    def update(self, frame: pd.DataFrame):
+        best = self._select(frame)
+        self._rows = best if self._rows is None else self._select(pd.concat([self._rows, best]))
+
+    def result(self) -> pd.DataFrame:
+        return pd.DataFrame() if self._rows is None else self._rows.reset_index(drop=True)
+
+
+def _project(frame: pd.DataFrame, columns: Optional[Sequence[str]]) -> pd.DataFrame:
+    return frame[list(columns)] if columns else frame
+
+
+def chunked_query(csv_path: str, filters: Sequence[Filter] = (), group_by: Sequence[str] = (),
+                  aggregates: Sequence[Aggregate] = (), top_k: TopK = None, columns: Sequence[str] = None,
+                  limit: int = None, chunk_rows: int = CHUNK_ROWS) -> QueryResult:
+    """
+    Filter, then aggregate (optionally per group), take the top k rows, or
+    return the first `limit` matching rows, reading `csv_path` `chunk_rows`
+    rows at a time. Memory use is bounded by the chunk size plus the size of
+    the result.
+    """
+    partial_aggs = PartialAggregates(aggregates, group_by) if aggregates else None
+    partial_top = PartialTopK(top_k) if top_k and not aggregates else None
+    rows = []
+    kept = 0
+    matched = 0
+
+    for chunk in iter_chunks(csv_path, chunk_rows):
+        if filters:
+            chunk = chunk.loc[filter_mask(chunk, filters)]
+        matched += len(chunk)
+        if partial_aggs is not None:
+            partial_aggs.update(chunk)
+        elif partial_top is not None:
+            partial_top.update(chunk)
+        elif limit is None or kept < limit:
+            take = chunk if limit is None else chunk.head(limit - kept)
+            rows.append(_project(take, columns))
+            kept += len(take)
+
+    if partial_aggs is not None:
+        frame = partial_aggs.result()
+    elif partial_top is not None:
+        frame = _project(partial_top.result(), columns)
+    else:
+        frame = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(columns=list(columns or []))
+    return QueryResult(frame, matched)
+
+
+def in_memory_query(df: pd.DataFrame, filters: Sequence[Filter] = (), group_by: Sequence[str] = (),
+                    aggregates: Sequence[Aggregate] = (), top_k: TopK = None, columns: Sequence[str] = None,
+                    limit: int = None) -> QueryResult:
+    """
+    The same query answered from a loaded DataFrame; the reference that
+    chunked_query is checked against.
+    """
+    rows = df.loc[filter_mask(df, filters)] if filters else df
+    if aggregates:
+        def reduce(frame, agg):
+            if agg.column is None:
+                return len(frame)
+            return getattr(frame[agg.column], agg.func)()
+
+        if group_by:
+            grouped = rows.groupby(list(group_by), sort=True)
+            frame = pd.DataFrame({
+                agg.label: grouped.size() if agg.column is None else grouped[agg.column].agg(agg.func)
+                for agg in aggregates
+            }).reset_index()
+        else:
+            frame = pd.DataFrame({agg.label: [reduce(rows, agg)] for agg in aggregates})
+    elif top_k:
+        pick = rows.nlargest if top_k.largest else rows.nsmallest
+        frame = _project(pick(top_k.k, top_k.column).reset_index(drop=True), columns)
+    else:
+        frame = _project(rows if limit is None else rows.head(limit), columns).reset_index(drop=True)
+    return QueryResult(frame, len(rows))
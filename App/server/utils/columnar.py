@@ -0,0 +1,173 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+COLUMNAR_DIR_NAME = ".columnar"
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+
+
+def columnar_dir_for(csv_path: str) -> str:
+    """
+    Directory holding the columnar copy of `csv_path`, e.g.
+    csv_db/.columnar/customer_db/ for csv_db/customer_db.csv.
+    """
+    csv_path = os.path.abspath(csv_path)
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(os.path.dirname(csv_path), COLUMNAR_DIR_NAME, name)
+
+
+def _source_stat(csv_path: str) -> dict:
+    st = os.stat(csv_path)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def read_meta(csv_path: str):
+    try:
+        with open(os.path.join(columnar_dir_for(csv_path), META_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(csv_path: str) -> bool:
+    meta = read_meta(csv_path)
+    return (
+        meta is not None
+        and meta.get("format_version") == FORMAT_VERSION
+        and meta.get("source") == _source_stat(csv_path)
+    )
+
+
+def columnar_bytes(csv_path: str) -> int:
+    """
+    Size of the column files of a fresh columnar copy (0 if there is none):
+    what memory-mapping the table adds to a process's address space.
+    """
+    if not is_fresh(csv_path):
+        return 0
+    out_dir = columnar_dir_for(csv_path)
+    return sum(os.path.getsize(os.path.join(out_dir, c["file"])) for c in read_meta(csv_path)["columns"])
+
+
+def convert_csv(csv_path: str) -> str:
+    """
+    Convert a CSV into one .npy file per column so it can be memory-mapped.
+
+    Numeric and boolean columns are stored as-is. Everything else is
+    dictionary-encoded: int32 codes (-1 for missing) plus a JSON list of
+    categories. Returns the output directory.
+    """
+    csv_path = os.path.abspath(csv_path)
+    out_dir = columnar_dir_for(csv_path)
+    logger.info("[Columnar] Converting %s -> %s", csv_path, out_dir)
+    source = _source_stat(csv_path)
+    df = pd.read_csv(csv_path)
+
+    os.makedirs(os.path.dirname(out_dir), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(out_dir))
+    try:
+        columns = []
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            file_name = f"{i:04d}.npy"
+            if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+                np.save(os.path.join(tmp_dir, file_name), series.to_numpy())
+                columns.append({"name": str(name), "file": file_name, "kind": "numeric", "dtype": str(series.dtype)})
+            else:
+                codes, categories = pd.factorize(series.astype("string"), use_na_sentinel=True)
+                np.save(os.path.join(tmp_dir, file_name), codes.astype(np.int32))
+                columns.append({
+                    "name": str(name),
+                    "file": file_name,
+                    "kind": "category",
+                    "dtype": str(series.dtype),
+                    "categories": [str(c) for c in categories],
+                })
+
+        with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+            json.dump({
+                "format_version": FORMAT_VERSION,
+                "source": source,
+                "rows": len(df),
+                "columns": columns,
+            }, f)
+
+        if os.path.exists(out_dir):
+            shutil.rmtree(out_dir)
+        os.replace(tmp_dir, out_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return out_dir
+
+
+def load_columnar(csv_path: str) -> pd.DataFrame:
+    """
+    Load the columnar copy of `csv_path`. Column data is memory-mapped, so only
+    the pages a query touches are read from disk.
+
+    The frame is read-only and text columns are categoricals: it is meant for
+    the fast-path scans. Agents get `load_agent_table` frames instead.
+    """
+    out_dir = columnar_dir_for(csv_path)
+    meta = read_meta(csv_path)
+    data = {}
+    for column in meta["columns"]:
+        # A plain ndarray view of the mapping, so results are not np.memmap
+        values = np.asarray(np.load(os.path.join(out_dir, column["file"]), mmap_mode="r"))
+        if column["kind"] == "category":
+            values = pd.Categorical.from_codes(values, categories=column["categories"])
+        data[column["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def _decode(values: pd.Categorical, dtype: str) -> pd.Series:
+    try:
+        return pd.Series(values).astype(dtype)
+    except TypeError:
+        # Written by a pandas version whose text dtype this one does not know
+        return pd.Series(values).astype(object)
+
+
+def load_table(csv_path: str) -> pd.DataFrame:
+    """
+    Loader for the frame cache: use the columnar copy, (re)building it from the
+    CSV first when it is missing or older than the CSV.
+    """
+    try:
+        if not is_fresh(csv_path):
+            convert_csv(csv_path)
+        return load_columnar(csv_path)
+    except Exception as e:
+        logger.warning("[Columnar] Falling back to CSV for %s: %s", csv_path, e)
+        return pd.read_csv(csv_path)
+
+
+def load_agent_table(csv_path: str) -> pd.DataFrame:
+    """
+    Loader for frames handed to the pandas agents: the same dtypes as
+    pd.read_csv, so generated code behaves as it would on the CSV. Text
+    columns are decoded from the columnar copy; numeric columns stay
+    memory-mapped and are copied on first write (see frame_cache.private_copy).
+    """
+    try:
+        if not is_fresh(csv_path):
+            convert_csv(csv_path)
+        df = load_columnar(csv_path)
+        meta = read_meta(csv_path)
+        for column in meta["columns"]:
+            if column["kind"] == "category":
+                df[column["name"]] = _decode(df[column["name"]].array, column["dtype"])
+        return df
+    except Exception as e:
+        logger.warning("[Columnar] Falling back to CSV for %s: %s", csv_path, e)
+        return pd.read_csv(csv_path)
@@ -1,38 +1,133 @@
 from langchain_openai import ChatOpenAI
 from langchain.agents.agent_types import AgentType
-from langchain_experimental.agents.agent_toolkits import create_csv_agent
+from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe_agent
 import logging
 import os
+from typing import List
+
+from .frame_cache import FrameCache, get_frame_cache, private_copy
+from .columnar import load_agent_table
+from .plan_cache import PlanCache
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# What AgentExecutor answers when max_iterations or max_execution_time is hit
+AGENT_STOPPED_PREFIX = "Agent stopped due to"
+
+
+def _column_names(db_entry: dict) -> List[str]:
+    columns = db_entry.get("columns") or ""
+    if isinstance(columns, str):
+        columns = columns.split(",")
+    return [c.strip() for c in columns if c and c.strip()]
+
+
+def detect_join_keys(db_entries: List[dict]) -> List[tuple]:
+    """
+    Likely join keys between each pair of tables, from the `columns` metadata.
+
+    Columns match when their names are equal ignoring case and spacing;
+    ID-like columns are listed first. Returns (i, j, column_i, column_j) tuples.
+    """
+    def normalise(name):
+        return "".join(name.lower().split()).replace("_", "")
+
+    keys = []
+    for i in range(len(db_entries)):
+        left = {normalise(c): c for c in _column_names(db_entries[i])}
+        for j in range(i + 1, len(db_entries)):
+            right = {normalise(c): c for c in _column_names(db_entries[j])}
+            shared = sorted(set(left) & set(right), key=lambda n: (not n.endswith("id"), n))
+            keys.extend((i, j, left[n], right[n]) for n in shared)
+    return keys
+
+
+def finish_result(result: dict, intermediate_steps) -> dict:
+    """
+    When the agent was stopped by its time or iteration limit, answer with the
+    last thing it computed instead of the bare stop message.
+    """
+    output = str(result.get("output", ""))
+    if output.startswith(AGENT_STOPPED_PREFIX):
+        result["partial"] = True
+        if intermediate_steps:
+            result["output"] = f"Partial result (the analysis was stopped early): {intermediate_steps[-1][1]}"
+    return result
+
+
 class CSVAgentGPTInstance:
-    def __init__(self, debug=False) -> None:
+    def __init__(self, debug=False, frame_cache: FrameCache = None, plan_cache: PlanCache = None,
+                 max_execution_time: float = None) -> None:
         logger.info("[CSVAgent] Initializing CSVAgentGPTInstance with debug=%s", debug)
         self.llm = ChatOpenAI(temperature=0, model="gpt-3.5-turbo")
         self.debug = debug
+        self.max_execution_time = max_execution_time
+        # Parsed CSVs are shared process-wide unless a cache is injected
+        self.frame_cache = frame_cache or get_frame_cache()
+        self.plan_cache = plan_cache or PlanCache()
 
-    def get_csv_agent(self, db_path: str):
-        # Ensure path is absolute
-        if not os.path.isabs(db_path):
-            db_path = os.path.abspath(db_path)
-        logger.info("[CSVAgent] Creating CSV agent for path: %s", db_path)
-
-        return create_csv_agent(
+    def build_agent(self, df):
+        return create_pandas_dataframe_agent(
             self.llm,
-            db_path,
+            df,
             verbose=self.debug,
             agent_type=AgentType.OPENAI_FUNCTIONS,
             allow_dangerous_code=True,
+            return_intermediate_steps=True,
+            max_execution_time=self.max_execution_time,
         )
 
+    def get_csv_agent(self, db_path: str):
+        """
+        A new agent over a private copy of the cached table. Agents are not
+        reused: the REPL keeps the variables each run defines, and the code
+        may modify the frame it was given.
+        """
+        # Ensure path is absolute
+        if not os.path.isabs(db_path):
+            db_path = os.path.abspath(db_path)
+        logger.info("[CSVAgent] Getting CSV agent for path: %s", db_path)
+        return self.build_agent(private_copy(self.frame_cache.get_frame(db_path, loader=load_agent_table)))
+
     def get_csv_agent_output(self, db_path: str, question: str) -> str:
         # Ensure path is absolute
         if not os.path.isabs(db_path):
             db_path = os.path.abspath(db_path)
         logger.info("[CSVAgent] Getting CSV agent output for question: %s", question)
-        agent = self.get_csv_agent(db_path)
+        df = self.frame_cache.get_frame(db_path, loader=load_agent_table)
+        output = self.plan_cache.run(db_path, df, question)
+        if output is not None:
+            return {"input": question, "output": output}
+
+        agent = self.build_agent(private_copy(df))
         result = agent.invoke(question)
+        steps = result.pop("intermediate_steps", None)
+        if not str(result.get("output", "")).startswith(AGENT_STOPPED_PREFIX):
+            self.plan_cache.record(db_path, df, question, steps)
+        result = finish_result(result, steps)
+        logger.info("[CSVAgent] Output result: %s", result)
+        logger.debug("[CSVAgent] Frame cache stats: %s", self.frame_cache.stats())
+        return result
+
+    def get_multi_csv_agent(self, db_paths: List[str]):
+        """
+        One agent over private copies of all the given tables (df1, df2, ...
+        in order). The tables themselves come from the frame cache.
+        """
+        db_paths = [os.path.abspath(p) for p in db_paths]
+        logger.info("[CSVAgent] Creating multi-table CSV agent for paths: %s", db_paths)
+        frames = [private_copy(self.frame_cache.get_frame(p, loader=load_agent_table)) for p in db_paths]
+        return self.build_agent(frames)
+
+    def get_multi_csv_agent_output(self, db_entries: List[dict], question: str):
+        logger.info("[CSVAgent] Getting multi-table output for question: %s", question)
+        agent = self.get_multi_csv_agent([db["db_path"] for db in db_entries])
+
+        lines = [f"df{i + 1} is the {db['database_name']} table." for i, db in enumerate(db_entries)]
+        for i, j, left, right in detect_join_keys(db_entries):
+            lines.append(f"df{i + 1}['{left}'] can be joined with df{j + 1}['{right}'].")
+        result = agent.invoke("\n".join(lines) + f"\n\nQuestion: {question}")
+        result = finish_result(result, result.pop("intermediate_steps", None))
         logger.info("[CSVAgent] Output result: %s", result)
         return result
@@ -0,0 +1,248 @@
+import os
+import sys
+import time
+import atexit
+import logging
+import threading
+import subprocess
+from multiprocessing.connection import Client
+from typing import List
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+CSV_POOL_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+# Wall-clock budget per query, including time spent waiting for a free worker
+CSV_QUERY_TIMEOUT = 60.0
+# Extra memory a worker may allocate while answering one query, on top of
+# the columnar files it maps
+CSV_QUERY_MEMORY = 2 * 1024 * 1024 * 1024
+# The agent inside the worker is asked to stop at this fraction of the budget,
+# leaving time to return what it has before the worker is killed
+SOFT_DEADLINE_FRACTION = 0.8
+# After workers fail to start, wait this long before trying again, doubling
+# on each further failure up to the maximum
+RESTART_BACKOFF_SECONDS = 1.0
+RESTART_BACKOFF_MAX_SECONDS = 60.0
+
+WORKER_MODULE = f"{__package__}.csv_worker"
+# Same name as csv_worker.AUTHKEY_ENV; not imported, so the pool does not load the worker module
+AUTHKEY_ENV = "CSV_WORKER_AUTHKEY"
+# Directory the top-level package is imported from, for the worker's sys.path
+PACKAGE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), *[".."] * len(__package__.split("."))))
+
+
+class _Worker:
+    """
+    One worker process, started as `python -m <package>.csv_worker` rather
+    than through multiprocessing: multiprocessing children re-import the
+    parent's __main__, which for `python -m server.main` builds the whole app.
+    """
+
+    def __init__(self, timeout: float, memory_budget: int):
+        self.authkey = os.urandom(32)
+        env = dict(os.environ, **{AUTHKEY_ENV: self.authkey.hex()})
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (PACKAGE_ROOT, env.get("PYTHONPATH")) if p)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", WORKER_MODULE, str(timeout * SOFT_DEADLINE_FRACTION), str(memory_budget)],
+            stdout=subprocess.PIPE, env=env,
+        )
+        self.conn = None
+        self.tables = set()
+
+    def connect(self):
+        # The worker prints its address once its imports are done
+        line = self.process.stdout.readline().decode().split()
+        self.process.stdout.close()
+        if len(line) != 2:
+            raise RuntimeError(f"CSV worker {self.process.pid} exited during startup")
+        self.conn = Client((line[0], int(line[1])), authkey=self.authkey)
+        return self
+
+    def stop(self, force: bool = False):
+        if not force and self.conn is not None:
+            try:
+                self.conn.send(None)
+                self.process.wait(1)
+            except (OSError, EOFError, subprocess.TimeoutExpired):
+                pass
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(1)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.conn is not None:
+            self.conn.close()
+
+
+class CSVWorkerPool:
+    """
+    Bounded pool of processes that run CSVAgentGPTInstance work off the
+    Socket.IO handler threads.
+
+    Each query has a wall-clock budget and a memory budget. The agent is told
+    to stop early so it can return a partial answer. If the worker still has
+    not answered when the budget runs out, it is killed and replaced, and the
+    caller gets a timeout result. Queries go to an idle worker that already
+    has the table loaded when there is one.
+
+    Results are the agent's {"input", "output"} dict plus a "status" of ok,
+    partial, timeout, memory or error.
+    """
+
+    def __init__(self, workers: int = CSV_POOL_WORKERS, timeout: float = CSV_QUERY_TIMEOUT,
+                 memory_budget: int = CSV_QUERY_MEMORY):
+        logger.info("[CSVPool] Initializing with workers=%d, timeout=%.1fs, memory_budget=%d",
+                    workers, timeout, memory_budget)
+        self.size = workers
+        self.timeout = timeout
+        self.memory_budget = memory_budget
+        self.timeouts = 0
+        self.restarts = 0
+        self._started = False
+        self._idle = []
+        self._workers = []
+        self._spawning = 0  # workers being started outside the lock
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _fill(self):
+        """
+        Start workers until the pool is back at its configured size. Processes
+        are spawned outside the lock, so callers waiting for a worker are not
+        held up by a slow start. After a failed start nothing is retried until
+        the backoff has passed.
+        """
+        with self._cond:
+            if self._closed or time.monotonic() < self._retry_at:
+                return
+            missing = self.size - len(self._workers) - self._spawning
+            if missing <= 0:
+                return
+            self._spawning += missing
+            if not self._started:
+                self._started = True
+                atexit.register(self.close)
+
+        started = []
+        try:
+            # Workers import in parallel; each one is connected once it is ready
+            pending = []
+            for _ in range(missing):
+                try:
+                    pending.append(_Worker(self.timeout, self.memory_budget))
+                except Exception as e:
+                    logger.error("[CSVPool] Could not spawn a worker: %s", e)
+            for worker in pending:
+                try:
+                    started.append(worker.connect())
+                except Exception as e:
+                    logger.error("[CSVPool] Worker failed to start: %s", e)
+                    worker.stop(force=True)
+        finally:
+            with self._cond:
+                self._spawning -= missing
+                if len(started) < missing:
+                    self._backoff = min(RESTART_BACKOFF_MAX_SECONDS, self._backoff * 2 or RESTART_BACKOFF_SECONDS)
+                    self._retry_at = time.monotonic() + self._backoff
+                    logger.warning("[CSVPool] %d of %d worker(s) failed to start, retrying in %.1fs",
+                                   missing - len(started), missing, self._backoff)
+                else:
+                    self._backoff = 0.0
+                closed = self._closed
+                if not closed:
+                    self._workers.extend(started)
+                    self._idle.extend(started)
+                self._cond.notify_all()
+        if closed:
+            for worker in started:
+                worker.stop()
+
+    def _acquire(self, paths: List[str], deadline: float):
+        # Also restarts workers lost to failed replacements, once the backoff allows
+        self._fill()
+        with self._cond:
+            while not self._idle:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed:
+                    return None
+                if not self._workers and not self._spawning:
+                    raise RuntimeError("no CSV worker could be started")
+                self._cond.wait(remaining)
+            worker = max(self._idle, key=lambda w: len(w.tables.intersection(paths)))
+            self._idle.remove(worker)
+            return worker
+
+    def _release(self, worker: _Worker):
+        with self._cond:
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def _replace(self, worker: _Worker):
+        worker.stop(force=True)
+        with self._cond:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            self.restarts += 1
+        self._fill()
+
+    def run(self, method: str, args: tuple, paths: List[str], question: str) -> dict:
+        deadline = time.monotonic() + self.timeout
+        try:
+            worker = self._acquire(paths, deadline)
+        except RuntimeError as e:
+            return {"input": question, "output": f"The query failed: {e}", "status": "error"}
+        if worker is None:
+            self.timeouts += 1
+            return {"input": question, "output": "All workers are busy; please try again shortly.",
+                    "status": "timeout"}
+
+        try:
+            worker.conn.send((method, args, paths))
+            if worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                result = worker.conn.recv()
+                worker.tables.update(paths)
+                self._release(worker)
+                return result
+        except (OSError, EOFError) as e:
+            logger.error("[CSVPool] Worker %d died: %s", worker.process.pid, e)
+            self._replace(worker)
+            return {"input": question, "output": "The query failed unexpectedly.", "status": "error"}
+
+        logger.warning("[CSVPool] Query exceeded %.1fs, killing worker %d: %s",
+                       self.timeout, worker.process.pid, question)
+        self.timeouts += 1
+        self._replace(worker)
+        return {"input": question, "output": "The query took too long and was cancelled.", "status": "timeout"}
+
+    def get_csv_agent_output(self, db_path: str, question: str) -> dict:
+        db_path = os.path.abspath(db_path)
+        return self.run("get_csv_agent_output", (db_path, question), [db_path], question)
+
+    def get_multi_csv_agent_output(self, db_entries: List[dict], question: str) -> dict:
+        # Catalog entries are read-only mappings, which cannot be pickled
+        db_entries = [dict(db) for db in db_entries]
+        paths = [os.path.abspath(db["db_path"]) for db in db_entries]
+        return self.run("get_multi_csv_agent_output", (db_entries, question), paths, question)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            workers, self._workers, self._idle = self._workers, [], []
+            self._cond.notify_all()
+        for worker in workers:
+            worker.stop()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "workers": len(self._workers),
+                "idle": len(self._idle),
+                "starting": self._spawning,
+                "timeouts": self.timeouts,
+                "restarts": self.restarts,
+            }
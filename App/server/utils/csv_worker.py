@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import logging
+import threading
+from multiprocessing.connection import Listener
+
+from .csv_agent import CSVAgentGPTInstance
+from .columnar import columnar_bytes
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Environment variable carrying the connection key from the pool
+AUTHKEY_ENV = "CSV_WORKER_AUTHKEY"
+# How often a worker checks that the process that started it is still alive
+PARENT_CHECK_SECONDS = 5
+
+try:
+    import resource
+except ImportError:  # Windows: memory budgets are not enforced
+    resource = None
+
+
+def _address_space() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _run_with_memory_budget(fn, memory_budget: int):
+    # RLIMIT_AS counts address space, file mappings included; callers add the
+    # size of the columnar files a query maps on top of its budget
+    if resource is None or not os.path.exists("/proc/self/statm"):
+        return fn()
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = _address_space() + memory_budget
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    try:
+        return fn()
+    finally:
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def serve(conn, soft_timeout: float, memory_budget: int):
+    """
+    Worker loop. The CSVAgentGPTInstance (and with it the frame and plan
+    caches) lives for the whole life of the process, so tables stay warm.
+    """
+    csv_agent = CSVAgentGPTInstance(max_execution_time=soft_timeout)
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        method, args, paths = message
+        # Mapping a table's column files is charged to the address space but
+        # is not memory the query allocates
+        budget = memory_budget + sum(columnar_bytes(p) for p in paths)
+        try:
+            result = _run_with_memory_budget(lambda: getattr(csv_agent, method)(*args), budget)
+            result = dict(result, status="partial" if result.get("partial") else "ok")
+        except MemoryError:
+            csv_agent.frame_cache.clear()
+            result = {"output": "The query needed more memory than it is allowed to use.", "status": "memory"}
+        except Exception as e:
+            logger.exception("[CSVWorker] Worker %d failed", os.getpid())
+            result = {"output": f"The query failed: {e}", "status": "error"}
+        conn.send(result)
+
+
+def _exit_with_parent(parent_pid: int):
+    while True:
+        time.sleep(PARENT_CHECK_SECONDS)
+        if os.getppid() != parent_pid:
+            os._exit(0)
+
+
+def main():
+    """
+    Entry point of a CSVWorkerPool process:
+
+        python -m server.utils.csv_worker <soft timeout> <memory budget>
+
+    Only the CSV agent code is imported, never the app in server.main. The
+    worker listens on a loopback port, prints "<host> <port>" on stdout for
+    the pool, and serves the one connection the pool makes.
+    """
+    soft_timeout, memory_budget = float(sys.argv[1]), int(sys.argv[2])
+    authkey = bytes.fromhex(os.environ.pop(AUTHKEY_ENV))
+    threading.Thread(target=_exit_with_parent, args=(os.getppid(),), daemon=True).start()
+    with Listener(("127.0.0.1", 0), authkey=authkey) as listener:
+        print("%s %d" % listener.address, flush=True)
+        # Whatever the agent prints from now on goes to stderr, not to the
+        # pipe the pool has stopped reading
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+        with listener.accept() as conn:
+            serve(conn, soft_timeout, memory_budget)
+
+
+if __name__ == "__main__":
+    main()
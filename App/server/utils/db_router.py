@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+from .helpers import tokenize
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Below this cosine similarity the best table is not trusted on its own
+ROUTER_MIN_SIMILARITY = 0.80
+# The runner-up must trail the best table by at least this much
+ROUTER_MARGIN = 0.03
+# Weight of the fraction of query terms that name one of the table's columns
+COLUMN_OVERLAP_WEIGHT = 0.1
+
+
+def database_text(db: dict) -> str:
+    return (
+        f"Database name: {db.get('database_name', '')}\n"
+        f"Description: {db.get('database_description', '')}\n"
+        f"Columns: {db.get('columns', '')}"
+    )
+
+
+class EmbeddingDBRouter:
+    """
+    Picks the database for a query without an LLM call.
+
+    Each database's name, description and columns are embedded once into a
+    row of a NumPy matrix. A query is scored against every table with one
+    matrix-vector product (cosine similarity) plus a bonus for query terms that
+    appear in the table's column names. When the two best tables both match
+    and are within the margin of each other, the question most likely spans
+    them ("orders for customers in the north region") and `route` returns
+    both. It returns None when no table is a confident match, so the caller
+    can ask the LLM router instead.
+
+    The matrix follows the database catalog: when its version changes only the
+    added or edited tables are embedded.
+    """
+
+    def __init__(self, embeddings, database_list, min_similarity: float = ROUTER_MIN_SIMILARITY,
+                 margin: float = ROUTER_MARGIN):
+        logger.info("[DBRouter] Initializing with min_similarity=%.2f, margin=%.2f", min_similarity, margin)
+        self.embeddings = embeddings
+        self.database_list = database_list
+        self.min_similarity = min_similarity
+        self.margin = margin
+        self.version = None
+        # (names, unit-vector matrix, column terms), swapped as one tuple
+        self._index = ([], None, [])
+        self._rows = {}  # name -> (text hash, unit vector, column terms)
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.fallbacks = 0
+
+    def sync(self):
+        """
+        Bring the matrix in line with the current catalog, embedding only the
+        databases that are new or whose name, description or columns changed.
+        """
+        snapshot = self.database_list.snapshot()
+        if snapshot.version == self.version:
+            return
+        with self._lock:
+            if snapshot.version == self.version:
+                return
+            entries = {db["database_name"]: db for db in snapshot.entries}
+            texts = {name: database_text(db) for name, db in entries.items()}
+            hashes = {name: hashlib.sha256(text.encode()).hexdigest() for name, text in texts.items()}
+            stale = [name for name in entries if self._rows.get(name, (None,))[0] != hashes[name]]
+
+            if stale:
+                logger.info("[DBRouter] Embedding %d database(s): %s", len(stale), stale)
+                vectors = np.asarray(self.embeddings.embed_documents([texts[n] for n in stale]), dtype=np.float32)
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                vectors = vectors / np.where(norms == 0, 1, norms)
+                for name, vector in zip(stale, vectors):
+                    columns = entries[name].get("columns") or ""
+                    if isinstance(columns, list):
+                        columns = ", ".join(columns)
+                    self._rows[name] = (hashes[name], vector, frozenset(tokenize(columns)))
+
+            self._rows = {name: row for name, row in self._rows.items() if name in entries}
+            self._index = (
+                list(self._rows),
+                np.stack([row[1] for row in self._rows.values()]) if self._rows else None,
+                [row[2] for row in self._rows.values()],
+            )
+            self.version = snapshot.version
+
+    def scores(self, query: str, index) -> tuple:
+        """
+        (cosine similarity, similarity plus column-overlap bonus) per table.
+        """
+        _, matrix, column_terms = index
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        similarity = matrix @ (vector / norm if norm else vector)
+        terms = set(tokenize(query))
+        overlap = np.array([len(terms & cols) / len(terms) if terms else 0.0 for cols in column_terms])
+        return similarity, similarity + COLUMN_OVERLAP_WEIGHT * overlap
+
+    def route(self, query: str) -> Optional[List[str]]:
+        """
+        Returns [database_name] when one table is a confident match,
+        [best, runner_up] when two tables match about equally well, otherwise
+        None.
+        """
+        try:
+            self.sync()
+            index = self._index
+            names = index[0]
+            if index[1] is None:
+                return None
+            similarity, scores = self.scores(query, index)
+        except Exception as e:
+            logger.warning("[DBRouter] Local routing failed, using LLM router: %s", e)
+            self.fallbacks += 1
+            return None
+
+        order = np.argsort(-scores)
+        best = int(order[0])
+        second = int(order[1]) if len(order) > 1 else None
+        runner_up = scores[second] if second is not None else -np.inf
+        if similarity[best] >= self.min_similarity and scores[best] - runner_up >= self.margin:
+            self.local_hits += 1
+            logger.info("[DBRouter] Routed locally to %s (similarity %.3f, score %.3f, next %.3f)",
+                        names[best], similarity[best], scores[best], runner_up)
+            return [names[best]]
+        if similarity[best] >= self.min_similarity and second is not None and \
+                similarity[second] >= self.min_similarity:
+            self.local_hits += 1
+            logger.info("[DBRouter] Routed locally to %s and %s (scores %.3f, %.3f)",
+                        names[best], names[second], scores[best], runner_up)
+            return [names[best], names[second]]
+
+        self.fallbacks += 1
+        logger.info("[DBRouter] Low confidence (best %s at %.3f, next %.3f), using LLM router",
+                    names[best], scores[best], runner_up)
+        return None
+
+    def stats(self) -> dict:
+        return {"databases": len(self._index[0]), "local_hits": self.local_hits, "fallbacks": self.fallbacks}
@@ -0,0 +1,222 @@
+import re
+import time
+import difflib
+import logging
+import threading
+from collections import defaultdict, deque
+from typing import Callable, Hashable, Iterable, List, Optional
+
+from .helpers import STOPWORDS
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+ENTITY_QUERY = "MATCH (e:__Entity__) WHERE e.id IS NOT NULL RETURN DISTINCT toString(e.id) AS id LIMIT $limit"
+ENTITY_LIMIT = 500_000
+# How often the graph is checked for changes to its entities
+ENTITY_REFRESH_SECONDS = 300
+# Retry interval while no entity list has been loaded yet
+ENTITY_RETRY_SECONDS = 30
+ENTITY_MIN_LENGTH = 3
+# Near-misses ("Acme Corpp", "Jon Smith") must be at least this similar
+FUZZY_CUTOFF = 0.85
+FUZZY_MIN_LENGTH = 4
+FUZZY_MAX_WORDS = 4
+# Prefixes shared by more entities than this are too common to narrow the search
+FUZZY_MAX_CANDIDATES = 2000
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def words(text: str) -> List[str]:
+    return WORD_PATTERN.findall(str(text).lower())
+
+
+class WordAutomaton:
+    """
+    Aho-Corasick automaton over words rather than characters, so every match
+    starts and ends on a word boundary and the trie stays small. `find` is
+    linear in the number of words in the text (plus the matches reported).
+    """
+
+    def __init__(self, patterns: Iterable[List[str]]):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]  # pattern indexes ending at each state
+        self.lengths = []
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for word in pattern:
+                nxt = self.goto[state].get(word)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][word] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append(index)
+            self.lengths.append(len(pattern))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and word not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(word, 0) if self.goto[f].get(word) != nxt else 0
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def find(self, tokens: List[str]):
+        """
+        Yields (start word, end word exclusive, pattern index) for every match.
+        """
+        state = 0
+        for i, word in enumerate(tokens):
+            while state and word not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(word, 0)
+            for index in self.output[state]:
+                yield i + 1 - self.lengths[index], i + 1, index
+
+
+class _Snapshot:
+    def __init__(self, ids: List[str]):
+        patterns = {}
+        for entity_id in ids:
+            key = tuple(words(entity_id))
+            text = " ".join(key)
+            if len(text) < ENTITY_MIN_LENGTH or all(w in STOPWORDS for w in key):
+                continue
+            patterns.setdefault(key, entity_id)
+        self.keys = list(patterns)
+        self.ids = list(patterns.values())
+        self.automaton = WordAutomaton(self.keys)
+        # Fuzzy candidates are narrowed to entities with as many words that
+        # share a word prefix
+        self.by_prefix = defaultdict(set)
+        for index, key in enumerate(self.keys):
+            if len(key) <= FUZZY_MAX_WORDS:
+                for word in key:
+                    if len(word) >= 3:
+                        self.by_prefix[(word[:3], len(key))].add(index)
+
+
+class EntityMatcher:
+    """
+    Finds mentions of the graph's __Entity__ ids in text without an LLM call.
+
+    Ids are loaded from Neo4j into a word-level Aho-Corasick automaton; when
+    nothing matches exactly, word n-grams of the text are compared with
+    entities that share a word prefix, to catch typos and transcription
+    slips. The id list is reloaded in the background when `version_fn` (the
+    graph fingerprint) changes, checked at most every `refresh_seconds`.
+    """
+
+    def __init__(self, graph_db, version_fn: Optional[Callable[[], Hashable]] = None,
+                 refresh_seconds: float = ENTITY_REFRESH_SECONDS):
+        self.graph_db = graph_db
+        self.version_fn = version_fn
+        self.refresh_seconds = refresh_seconds
+        self.version = None
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._refreshing = threading.Lock()
+        self._maybe_refresh()
+
+    def _load(self, version):
+        try:
+            start = time.perf_counter()
+            rows = self.graph_db.query(ENTITY_QUERY, {"limit": ENTITY_LIMIT})
+            snapshot = _Snapshot([row["id"] for row in rows])
+            self._snapshot = snapshot
+            self.version = version
+            logger.info("[EntityMatcher] Indexed %d entities in %.0f ms",
+                        len(snapshot.ids), 1000 * (time.perf_counter() - start))
+        except Exception as e:
+            logger.warning(f"[EntityMatcher] Could not load entities: {e}")
+        finally:
+            self._refreshing.release()
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        interval = self.refresh_seconds if self._snapshot is not None else ENTITY_RETRY_SECONDS
+        if self._checked_at and now - self._checked_at < interval:
+            return
+        if not self._refreshing.acquire(blocking=False):
+            return
+        self._checked_at = now
+        try:
+            version = self.version_fn() if self.version_fn else now
+        except Exception:
+            version = now
+        if self._snapshot is not None and version == self.version:
+            self._refreshing.release()
+            return
+        # Queries keep using the previous automaton until the new one is ready
+        threading.Thread(target=self._load, args=(version,), daemon=True, name="entity-refresh").start()
+
+    def _fuzzy(self, snapshot: _Snapshot, tokens: List[str]) -> List[str]:
+        found = []
+        for n in range(1, FUZZY_MAX_WORDS + 1):
+            for i in range(len(tokens) - n + 1):
+                gram_words = tokens[i:i + n]
+                gram = " ".join(gram_words)
+                if len(gram) < FUZZY_MIN_LENGTH or any(w in STOPWORDS for w in (gram_words[0], gram_words[-1])):
+                    continue
+                candidates = set()
+                for word in gram_words:
+                    bucket = snapshot.by_prefix.get((word[:3], n), ())
+                    if len(bucket) <= FUZZY_MAX_CANDIDATES:
+                        candidates.update(bucket)
+                if not candidates:
+                    continue
+                names = {" ".join(snapshot.keys[c]): c for c in candidates}
+                close = difflib.get_close_matches(gram, list(names), n=1, cutoff=FUZZY_CUTOFF)
+                if close:
+                    found.append(snapshot.ids[names[close[0]]])
+        return found
+
+    def find(self, text: str) -> List[str]:
+        """
+        Entity ids mentioned in `text`, longest match first where mentions
+        overlap. Empty when nothing matched or the index is not loaded yet.
+        """
+        self._maybe_refresh()
+        snapshot = self._snapshot
+        if snapshot is None:
+            return []
+        tokens = words(text)
+
+        matches = sorted(snapshot.automaton.find(tokens), key=lambda m: (m[0] - m[1], m[0]))
+        taken = [False] * len(tokens)
+        found = []
+        for start, end, index in matches:
+            if any(taken[start:end]):
+                continue
+            taken[start:end] = [True] * (end - start)
+            found.append(snapshot.ids[index])
+        if found:
+            self.hits += 1
+            return list(dict.fromkeys(found))
+
+        found = self._fuzzy(snapshot, tokens)
+        if found:
+            self.fuzzy_hits += 1
+            return list(dict.fromkeys(found))
+        self.misses += 1
+        return []
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "entities": len(snapshot.ids) if snapshot else 0,
+            "hits": self.hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+        }
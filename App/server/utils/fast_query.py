@@ -0,0 +1,374 @@
+import os
+import re
+import logging
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .chunked import (
+    CHUNK_ROWS, Aggregate, PartialAggregates, TopK, chunked_query, iter_chunks, sample_frame,
+)
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Rows rendered for a plain lookup before the answer is truncated
+MAX_ROWS = 50
+
+AGGREGATE_WORDS = [
+    ("number of", "count"),
+    ("count of", "count"),
+    ("total", "sum"),
+    ("sum of", "sum"),
+    ("average", "mean"),
+    ("avg", "mean"),
+    ("mean", "mean"),
+    ("maximum", "max"),
+    ("highest", "max"),
+    ("max", "max"),
+    ("minimum", "min"),
+    ("lowest", "min"),
+    ("min", "min"),
+]
+
+# "Give me the customer ID, customer name, age of Customer A."
+PROMPT_PATTERN = re.compile(
+    r"^\s*(?:please\s+)?(?:give|get|show|find|list|return|tell)\s+me\s+(?:the\s+)?"
+    r"(?P<fields>.+)\s+(?:of|for)\s+(?P<value>[^.?!]+?)\s*[.?!]?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# "What is the average age by region?", "Number of orders per country"
+TABLE_PROMPT_PATTERN = re.compile(
+    r"^\s*(?:please\s+)?(?:(?:what\s+is|what's|give\s+me|show\s+me|get\s+me|tell\s+me)\s+)?(?:the\s+)?"
+    r"(?P<fields>.+?)(?:\s+(?:by|per|for\s+each|grouped\s+by)\s+(?P<group>[^.?!]+?))?\s*[.?!]?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+# "Show me the top 5 rows by revenue"
+TOP_PROMPT_PATTERN = re.compile(
+    r"^\s*(?:please\s+)?(?:(?:give|get|show|list)\s+me\s+)?(?:the\s+)?(?P<which>top|bottom)\s+(?P<k>\d+)"
+    r"(?:\s+(?:rows|records))?\s+by\s+(?P<column>[^.?!]+?)\s*[.?!]?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+# Words that name a table's rows in "number of <rows>"; the table's own name
+# ("orders" for orders.csv) is accepted too. Anything else after "number of"
+# ("female customers", "customers today") is a condition the count cannot drop.
+ROW_NOUNS = frozenset({"row", "record", "entry", "entries", "line"})
+
+
+def _norm(text: str) -> str:
+    return re.sub(r"[\W_]+", "", str(text).lower())
+
+
+class QueryPlan:
+    """
+    filter_value matched against filter_columns, then either a projection of
+    `columns` or a list of (label, func, column) aggregates.
+    """
+
+    def __init__(self, filter_value: str, filter_columns: List[str], columns: List[str], aggregates: List[tuple]):
+        self.filter_value = filter_value
+        self.filter_columns = filter_columns
+        self.columns = columns
+        self.aggregates = aggregates
+
+    def __repr__(self):
+        return (f"QueryPlan(filter={self.filter_value!r} in {self.filter_columns}, "
+                f"columns={self.columns}, aggregates={self.aggregates})")
+
+
+def _resolve_field(field: str, df: pd.DataFrame):
+    """
+    Map a requested field to ("column", name) or ("aggregate", func, name).
+    Returns None when the field cannot be mapped unambiguously.
+    """
+    by_norm = {_norm(c): c for c in df.columns}
+    key = _norm(field)
+    if key in by_norm:
+        return ("column", by_norm[key])
+
+    lowered = field.strip().lower()
+    for word, func in AGGREGATE_WORDS:
+        if not lowered.startswith(word + " "):
+            continue
+        rest = _norm(lowered[len(word):])
+        if func == "count":
+            return ("aggregate", func, None)
+        numeric = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c]) and rest and rest in _norm(c)]
+        if len(numeric) == 1:
+            return ("aggregate", func, numeric[0])
+        return None
+    return None
+
+
+def _input_column(name: str, df: pd.DataFrame) -> Optional[str]:
+    # "Customer Name" matches exactly; a bare "Name" matches a unique "... Name" column
+    key = _norm(name)
+    by_norm = {_norm(c): c for c in df.columns}
+    if key in by_norm:
+        return by_norm[key]
+    suffixed = [c for n, c in by_norm.items() if key and n.endswith(key)]
+    return suffixed[0] if len(suffixed) == 1 else None
+
+
+def plan_query(prompt: str, action: dict, df: pd.DataFrame) -> Optional[QueryPlan]:
+    """
+    Turn a generated action prompt plus the action's declared inputs into a
+    QueryPlan over `df`, or None if any part of it is not understood.
+    """
+    if re.search(r"\bthen\b", prompt, re.IGNORECASE):
+        return None  # Multi-step prompts need the agent
+    match = PROMPT_PATTERN.match(prompt)
+    if not match:
+        return None
+
+    fields = [f.strip() for f in re.split(r",|\band\b", match.group("fields")) if f.strip()]
+    if not fields:
+        fields = list(action.get("output", []))
+
+    filter_columns = []
+    for name in action.get("input", []):
+        column = _input_column(name, df)
+        if column is not None and column not in filter_columns:
+            filter_columns.append(column)
+    if not filter_columns:
+        return None
+
+    columns, aggregates = [], []
+    for field in fields:
+        resolved = _resolve_field(field, df)
+        if resolved is None:
+            return None
+        if resolved[0] == "column":
+            columns.append(resolved[1])
+        else:
+            aggregates.append((field, resolved[1], resolved[2]))
+    if columns and aggregates:
+        return None
+
+    return QueryPlan(match.group("value").strip(), filter_columns, columns, aggregates)
+
+
+def _match_mask(series: pd.Series, value: str) -> np.ndarray:
+    target = value.strip().casefold()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        hits = [i for i, c in enumerate(series.cat.categories) if str(c).strip().casefold() == target]
+        return series.cat.codes.isin(hits).to_numpy()
+    if pd.api.types.is_numeric_dtype(series):
+        try:
+            return (series == float(value)).to_numpy()
+        except ValueError:
+            return np.zeros(len(series), dtype=bool)
+    return (series.astype(str).str.strip().str.casefold() == target).to_numpy()
+
+
+def _candidate_values(value: str, column: str) -> List[str]:
+    # "customer name John Doe" / "Customer John Doe" -> also try "John Doe"
+    candidates = [value]
+    words = value.split()
+    column_words = {w.lower() for w in str(column).split()}
+    while words and words[0].lower() in column_words:
+        words = words[1:]
+        if words:
+            candidates.append(" ".join(words))
+    return candidates
+
+
+def _render_aggregates(plan: QueryPlan, values: List) -> str:
+    return "\n".join(f"{label}: {value}" for (label, _, _), value in zip(plan.aggregates, values))
+
+
+def _render_rows(plan: QueryPlan, rows: pd.DataFrame, total: int) -> str:
+    columns = plan.columns or list(rows.columns)
+    text = rows[columns].head(MAX_ROWS).to_string(index=False)
+    if total > MAX_ROWS:
+        text += f"\n... {total - MAX_ROWS} more rows"
+    return text
+
+
+def execute_plan(plan: QueryPlan, df: pd.DataFrame) -> Optional[str]:
+    mask = None
+    for column in plan.filter_columns:
+        for value in _candidate_values(plan.filter_value, column):
+            candidate = _match_mask(df[column], value)
+            if candidate.any():
+                mask = candidate
+                break
+        if mask is not None:
+            break
+    if mask is None:
+        return None
+
+    rows = df.loc[mask]
+    if plan.aggregates:
+        values = [len(rows) if func == "count" else getattr(rows[column], func)()
+                  for _, func, column in plan.aggregates]
+        return _render_aggregates(plan, values)
+    return _render_rows(plan, rows, len(rows))
+
+
+def execute_plan_chunked(plan: QueryPlan, csv_path: str, chunk_rows: int = CHUNK_ROWS) -> Optional[str]:
+    """
+    execute_plan for tables too large to load: one pass over the file that
+    tracks every (filter column, candidate value) pair and then answers from
+    the first pair that matched, in the order execute_plan would try them.
+    """
+    pairs = [(column, value) for column in plan.filter_columns
+             for value in _candidate_values(plan.filter_value, column)]
+    aggregates = [Aggregate(label, func, None if func == "count" else column)
+                  for label, func, column in plan.aggregates]
+    matched = [0] * len(pairs)
+    partials = [PartialAggregates(aggregates) for _ in pairs] if aggregates else None
+    kept = [[] for _ in pairs]
+
+    for chunk in iter_chunks(csv_path, chunk_rows):
+        for i, (column, value) in enumerate(pairs):
+            rows = chunk.loc[_match_mask(chunk[column], value)]
+            matched[i] += len(rows)
+            if partials is not None:
+                partials[i].update(rows)
+            elif sum(len(r) for r in kept[i]) < MAX_ROWS:
+                kept[i].append(rows.head(MAX_ROWS))
+
+    hit = next((i for i, n in enumerate(matched) if n), None)
+    if hit is None:
+        return None
+    if partials is not None:
+        result = partials[hit].result()
+        return _render_aggregates(plan, [result[agg.label].iloc[0] for agg in aggregates])
+    return _render_rows(plan, pd.concat(kept[hit]), matched[hit])
+
+
+def try_fast_query(prompt: str, action: dict, df: pd.DataFrame) -> Optional[dict]:
+    """
+    Answer `prompt` without any LLM call when it is a plain lookup or
+    aggregate. Returns an agent-shaped {"input", "output"} dict, or None so
+    the caller can fall back to the agent.
+    """
+    try:
+        plan = plan_query(prompt, action, df)
+        if plan is None:
+            return None
+        output = execute_plan(plan, df)
+        if output is None:
+            return None
+        logger.info("[FastQuery] Answered without LLM using %s", plan)
+        return {"input": prompt, "output": output}
+    except Exception as e:
+        logger.warning("[FastQuery] Falling back to agent: %s", e)
+        return None
+
+
+def try_fast_query_chunked(prompt: str, action: dict, csv_path: str) -> Optional[dict]:
+    """
+    try_fast_query for a table that is only read chunk by chunk; the plan is
+    made against a sample of its first rows.
+    """
+    try:
+        plan = plan_query(prompt, action, sample_frame(csv_path))
+        if plan is None:
+            return None
+        output = execute_plan_chunked(plan, csv_path)
+        if output is None:
+            return None
+        logger.info("[FastQuery] Answered without LLM in chunked mode using %s", plan)
+        return {"input": prompt, "output": output}
+    except Exception as e:
+        logger.warning("[FastQuery] Chunked mode falling back to agent: %s", e)
+        return None
+
+
+class TablePlan:
+    """
+    An unfiltered aggregate (optionally per group) or top-k over a whole
+    table, in the keyword form chunked_query takes.
+    """
+
+    def __init__(self, group_by: List[str] = (), aggregates: List[Aggregate] = (), top_k: TopK = None):
+        self.group_by = list(group_by)
+        self.aggregates = list(aggregates)
+        self.top_k = top_k
+
+    def query_args(self) -> dict:
+        return {"group_by": self.group_by, "aggregates": self.aggregates, "top_k": self.top_k}
+
+    def __repr__(self):
+        return f"TablePlan(group_by={self.group_by}, aggregates={self.aggregates}, top_k={self.top_k})"
+
+
+def _singular(word: str) -> str:
+    return word[:-1] if word.endswith("s") and not word.endswith("ss") else word
+
+
+def plan_table_query(prompt: str, df: pd.DataFrame, table_names: List[str] = ()) -> Optional[TablePlan]:
+    """
+    Turn a question with no row filter into a TablePlan over `df`, or None
+    if any part of it is not understood. A count is planned only for
+    "number of <rows>", where <rows> is a ROW_NOUNS word or one of
+    `table_names`.
+    """
+    row_nouns = ROW_NOUNS | {_singular(_norm(name)) for name in table_names}
+    match = TOP_PROMPT_PATTERN.match(prompt)
+    if match:
+        column = _input_column(match.group("column"), df)
+        if column is None or not pd.api.types.is_numeric_dtype(df[column]):
+            return None
+        return TablePlan(top_k=TopK(column, int(match.group("k")), match.group("which").lower() == "top"))
+
+    match = TABLE_PROMPT_PATTERN.match(prompt)
+    if not match:
+        return None
+    group_by = []
+    if match.group("group"):
+        column = _input_column(match.group("group"), df)
+        if column is None:
+            return None
+        group_by.append(column)
+
+    aggregates = []
+    for field in [f.strip() for f in re.split(r",|\band\b", match.group("fields")) if f.strip()]:
+        resolved = _resolve_field(field, df)
+        if resolved is None or resolved[0] != "aggregate":
+            return None
+        _, func, column = resolved
+        if func == "count":
+            counted = field.lower().split()[2:]
+            if len(counted) != 1 or _singular(_norm(counted[0])) not in row_nouns:
+                return None
+        aggregates.append(Aggregate(field, func, column))
+    if not aggregates:
+        return None
+    return TablePlan(group_by, aggregates)
+
+
+def _render_table(plan: TablePlan, frame: pd.DataFrame) -> str:
+    if not plan.group_by and not plan.top_k:
+        # Rounded like to_string does, so float sums read the same whichever order they were added in
+        values = [frame[agg.label].iloc[0] for agg in plan.aggregates]
+        values = [round(float(v), 6) if isinstance(v, (float, np.floating)) else v for v in values]
+        return "\n".join(f"{agg.label}: {value}" for agg, value in zip(plan.aggregates, values))
+    text = frame.head(MAX_ROWS).to_string(index=False)
+    if len(frame) > MAX_ROWS:
+        text += f"\n... {len(frame) - MAX_ROWS} more rows"
+    return text
+
+
+def try_table_query_chunked(prompt: str, csv_path: str, table_names: List[str] = (),
+                            chunk_rows: int = CHUNK_ROWS) -> Optional[dict]:
+    """
+    Answer a whole-table aggregate, group-by or top-k question over a table
+    too large to load, in one chunked_query pass and without any LLM call.
+    Returns None so the caller can fall back to the SQL agent.
+    """
+    try:
+        table_name = os.path.splitext(os.path.basename(csv_path))[0]
+        plan = plan_table_query(prompt, sample_frame(csv_path), [table_name, *table_names])
+        if plan is None:
+            return None
+        result = chunked_query(csv_path, chunk_rows=chunk_rows, **plan.query_args())
+        logger.info("[FastQuery] Answered without LLM in chunked mode using %s", plan)
+        return {"input": prompt, "output": _render_table(plan, result.frame)}
+    except Exception as e:
+        logger.warning("[FastQuery] Chunked table query falling back to agent: %s", e)
+        return None
@@ -0,0 +1,136 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Total in-memory size of cached DataFrames before the least recently used are dropped
+FRAME_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+
+def private_copy(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    A copy of a cached frame that agent or plan code may modify freely.
+
+    With pandas copy-on-write (always on from pandas 3) the copy is lazy:
+    columns stay shared until the code writes to them. Without it the copy
+    is deep.
+    """
+    copy_on_write = int(pd.__version__.split(".")[0]) >= 3 or pd.options.mode.copy_on_write is True
+    return df.copy(deep=not copy_on_write)
+
+
+class _Entry:
+    def __init__(self, frame: pd.DataFrame, nbytes: int):
+        self.frame = frame
+        self.nbytes = nbytes
+
+
+class FrameCache:
+    """
+    Process-wide LRU of parsed CSV files.
+
+    Entries are keyed by absolute path plus the file's mtime and size, and by
+    loader (a table may be cached both as a scan frame and as an agent frame),
+    so an edited file is parsed again and its stale entry dropped. Eviction is by the
+    total deep memory usage of the cached DataFrames.
+
+    Cached frames are shared across requests and threads and must not be
+    modified; anything that runs generated code gets a `private_copy`.
+    """
+
+    def __init__(self, max_bytes: int = FRAME_CACHE_MAX_BYTES):
+        logger.info("[FrameCache] Initializing with max_bytes=%d", max_bytes)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    @staticmethod
+    def key_for(path: str):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size)
+
+    def _get_entry(self, path: str, loader: Callable[[str], pd.DataFrame]) -> _Entry:
+        key = self.key_for(path) + (getattr(loader, "__name__", repr(loader)),)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one thread parses a given file version; the others wait for it
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+
+            try:
+                logger.info("[FrameCache] Loading DataFrame from: %s", key[0])
+                frame = loader(key[0])
+                entry = _Entry(frame, int(frame.memory_usage(deep=True).sum()))
+
+                with self._lock:
+                    for stale in [k for k in self._entries if k[0] == key[0] and k[3] == key[3]]:
+                        self._drop(stale)
+                    self._entries[key] = entry
+                    self.total_bytes += entry.nbytes
+                    while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                        self._drop(next(iter(self._entries)))
+                        self.evictions += 1
+                return entry
+            finally:
+                with self._lock:
+                    self._load_locks.pop(key, None)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.nbytes
+        logger.info("[FrameCache] Dropped %s (%d bytes)", key[0], entry.nbytes)
+
+    def get_frame(self, path: str, loader: Callable[[str], pd.DataFrame] = pd.read_csv) -> pd.DataFrame:
+        return self._get_entry(path, loader).frame
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_frame_cache = None
+_frame_cache_lock = threading.Lock()
+
+
+def get_frame_cache() -> FrameCache:
+    global _frame_cache
+    with _frame_cache_lock:
+        if _frame_cache is None:
+            _frame_cache = FrameCache()
+        return _frame_cache
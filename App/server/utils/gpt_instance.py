@@ -1,5 +1,6 @@
 import logging
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
 
 from langchain_openai import ChatOpenAI
 from langchain.agents.agent_types import AgentType
@@ -7,31 +8,54 @@ from langchain_experimental.agents.agent_toolkits import create_csv_agent
 
 from .chains import Chains
 from .message_store import MessageStore
+from .helpers import stream_to_callback
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Upper bound on question-generation chains running at once across all sessions
+QUESTION_WORKERS = 8
+
 class GPTInstance:
-    def __init__(self, llm, chains: Chains, debug=False) -> None:
+    def __init__(self, llm, chains: Chains, debug=False, semantic_cache=None, response_gate=None) -> None:
         logger.info("[GPTInstance] Initializing GPTInstance")
         self.llm = llm
         self.chains = chains
         self.debug = debug
+        self.semantic_cache = semantic_cache
+        self.response_gate = response_gate
+        self.executor = ThreadPoolExecutor(max_workers=QUESTION_WORKERS, thread_name_prefix="gpt-questions")
 
-    def process_message(self, message: str, message_store: MessageStore, session_id: str) -> List[str]:
+    def process_message(self, message: str, message_store: MessageStore, session_id: str,
+                        on_response: Optional[Callable[[str], None]] = None,
+                        on_delta: Optional[Callable[[str], None]] = None) -> List[str]:
         """
         Process a message and return AI response + follow-up + tangential questions.
+
+        If `on_response` is given it is called with the main response as soon as it
+        is ready, while the follow-up and tangential questions are still generating.
+        If `on_delta` is given the main response is streamed to it token by token.
         """
         logger.info("[GPTInstance] Processing message: %s", message)
-        chat_history = message_store.get_messages(session_id)
+        chat_history = message_store.get_history(session_id)
         logger.debug("[GPTInstance] Retrieved chat history: %s", chat_history)
 
         response_chain = self.chains.get_response_chain()
-        response = response_chain.invoke({"question": message})
+        if on_delta:
+            response = stream_to_callback(response_chain, {"question": message}, on_delta)
+        else:
+            response = response_chain.invoke({"question": message})
         logger.info("[GPTInstance] Main response: %s", response)
 
-        follow_up = self.get_follow_up_questions(chat_history, response)
-        tangential = self.get_tangential_questions(chat_history, response)
+        # Both question chains only depend on the history and the response
+        follow_up_future = self.executor.submit(self.get_follow_up_questions, chat_history, response)
+        tangential_future = self.executor.submit(self.get_tangential_questions, chat_history, response)
+
+        if on_response:
+            on_response(response)
+
+        follow_up = follow_up_future.result()
+        tangential = tangential_future.result()
 
         logger.info("[GPTInstance] Follow-up questions: %s", follow_up)
         logger.info("[GPTInstance] Tangential questions: %s", tangential)
@@ -41,19 +65,35 @@ class GPTInstance:
     def check_for_response(self, message: str, message_store: MessageStore, session_id: str) -> bool:
         """
         Check whether the AI should respond.
+
+        With a response gate, filler and confidently classified lines are
+        decided locally and only the ambiguous ones reach the LLM chains.
         """
         logger.info("[GPTInstance] Checking if response is needed for: %s", message)
-        history = message_store.get_messages(session_id)
+        history = message_store.get_history(session_id)
         logger.debug("[GPTInstance] Session history: %s", history)
 
+        gate = self.response_gate
+        # Repeats are checked against the full transcript; the summarised,
+        # token-budgeted history is only for the LLM prompt below
+        messages = message_store.get_messages(session_id)
+        local, source = gate.decide(message, messages) if gate is not None else (None, None)
+        if local is not None and not gate.shadow:
+            logger.info("[GPTInstance] Response gate (%s) decided: %s", source, local)
+            gate.record_local(source)
+            return local
+
         init_check = self.chains.get_initial_check_chain().invoke({"text": message})
         logger.info("[GPTInstance] Initial check result: %s", init_check)
 
+        respond = False
         if init_check:
             history_check = self.chains.get_history_check_chain().invoke({"text": message, "history": history})
             logger.info("[GPTInstance] History check result: %s", history_check)
-            return not history_check
-        return False
+            respond = not history_check
+        if gate is not None:
+            gate.record_llm(message, init_check)
+        return respond
 
     def elaborate_on_chosen_point(self, message: str) -> str:
         logger.info("[GPTInstance] Elaborating on message: %s", message)
@@ -68,7 +108,15 @@ class GPTInstance:
 
     def get_tangential_output(self, question: str):
         logger.info("[GPTInstance] Getting tangential output for: %s", question)
-        return self.chains.get_full_response_chain().invoke({"question": question})
+        if self.semantic_cache is None:
+            return self.chains.get_full_response_chain().invoke({"question": question})
+
+        cached, vector = self.semantic_cache.lookup("tangential", question)
+        if cached is not None:
+            return cached
+        response = self.chains.get_full_response_chain().invoke({"question": question})
+        self.semantic_cache.update("tangential", question, response, vector)
+        return response
 
     def get_tangential_questions(self, chat_history: List[str], question: str):
         logger.info("[GPTInstance] Getting tangential questions for: %s", question)
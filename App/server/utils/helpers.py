@@ -25,4 +25,38 @@ def generate_full_text_query(input: str) -> str:
     query_parts = [f"{word}~2" for word in words]
     result = " AND ".join(query_parts)
     logger.info("[Helpers] Final generated query: %s", result)
-    return result
\ No newline at end of file
+    return result
+
+def stream_to_callback(chain, inputs, on_delta) -> str:
+    """
+    Stream a runnable, passing each non-empty text chunk to `on_delta`.
+
+    Args:
+        chain: Any runnable whose chunks are strings or message chunks
+        inputs: Input passed to `chain.stream`
+        on_delta (callable): Called with each text delta as it arrives
+
+    Returns:
+        str: The concatenated output
+    """
+    parts = []
+    for chunk in chain.stream(inputs):
+        text = chunk.content if hasattr(chunk, "content") else str(chunk)
+        if text:
+            parts.append(text)
+            on_delta(text)
+    return "".join(parts)
+
+STOPWORDS = frozenset(
+    "a about an and are as at be by can do does for from give get has have how i in is it me my of on or "
+    "please show tell that the their them there these this to us was we what when where which who "
+    "whose why will with you your".split()
+)
+
+
+def tokenize(text: str) -> list:
+    """
+    Lowercased word tokens of `text` without stopwords, e.g.
+    "Customer ID of John" -> ["customer", "id", "john"].
+    """
+    return [t for t in re.findall(r"[a-z0-9]+", str(text).lower()) if t not in STOPWORDS]
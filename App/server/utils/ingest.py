@@ -0,0 +1,194 @@
+import os
+import time
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+PROFILE_CHUNK_ROWS = 100_000
+# Distinct values tracked per column before cardinality is reported as a lower bound
+PROFILE_DISTINCT_CAP = 100_000
+INGEST_WORKERS = 2
+# Finished jobs stay queryable for this long
+INGEST_JOB_TTL = 3600
+
+
+def save_stream(stream: BinaryIO, dest_path: str, chunk_size: int = UPLOAD_CHUNK_BYTES) -> tuple:
+    """
+    Copy `stream` to a temporary file next to `dest_path` in fixed-size chunks,
+    hashing it on the way. Returns (temp_path, sha256 hex digest); the caller
+    moves the file into place or deletes it.
+    """
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(prefix=".upload-", dir=os.path.dirname(dest_path))
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+class _ColumnProfile:
+    def __init__(self):
+        self.kinds = set()
+        self.nulls = 0
+        self.distinct = set()
+        self.capped = False
+        self.min = None
+        self.max = None
+
+    def update(self, series: pd.Series):
+        self.nulls += int(series.isna().sum())
+        values = series.dropna()
+        if values.empty:
+            return
+        if pd.api.types.is_bool_dtype(values):
+            self.kinds.add("boolean")
+        elif pd.api.types.is_integer_dtype(values):
+            self.kinds.add("integer")
+        elif pd.api.types.is_float_dtype(values):
+            self.kinds.add("float")
+        else:
+            self.kinds.add("string")
+            values = values.astype(str)
+
+        low, high = values.min(), values.max()
+        if "string" in self.kinds:
+            # A column that mixes numbers and text across chunks is compared as text
+            low, high = str(low), str(high)
+            if self.min is not None:
+                self.min, self.max = str(self.min), str(self.max)
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+        if not self.capped:
+            self.distinct.update(values.unique().tolist())
+            if len(self.distinct) > PROFILE_DISTINCT_CAP:
+                self.capped = True
+
+    def result(self, rows: int) -> dict:
+        if "string" in self.kinds:
+            kind = "string"
+        elif "float" in self.kinds:
+            kind = "float"
+        elif self.kinds:
+            kind = next(iter(self.kinds)) if len(self.kinds) == 1 else "integer"
+        else:
+            kind = "empty"
+
+        def plain(value):
+            return value.item() if hasattr(value, "item") else value
+
+        return {
+            "type": kind,
+            "null_rate": round(self.nulls / rows, 6) if rows else 0.0,
+            "cardinality": len(self.distinct),
+            "cardinality_is_lower_bound": self.capped,
+            "min": plain(self.min),
+            "max": plain(self.max),
+        }
+
+
+def profile_csv(csv_path: str, on_progress: Optional[Callable[[float], None]] = None,
+                chunk_rows: int = PROFILE_CHUNK_ROWS) -> dict:
+    """
+    Per-column type, null rate, cardinality and min/max, computed in one
+    chunked pass so the file never has to fit in memory.
+    """
+    size = os.path.getsize(csv_path) or 1
+    columns = {}
+    rows = 0
+    with open(csv_path, "rb") as f:
+        for chunk in pd.read_csv(f, chunksize=chunk_rows):
+            rows += len(chunk)
+            for name in chunk.columns:
+                columns.setdefault(str(name), _ColumnProfile()).update(chunk[name])
+            if on_progress:
+                on_progress(min(f.tell() / size, 1.0))
+    return {"rows": rows, "columns": {name: p.result(rows) for name, p in columns.items()}}
+
+
+class IngestJobs:
+    """
+    Background jobs for uploaded files. `submit` returns a job id at once; the
+    job function gets a progress(fraction) callback, and every state change is
+    passed to `on_update` as the job's status dict.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS, ttl: float = INGEST_JOB_TTL):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self.ttl = ttl
+        self._jobs = {}
+        self._finished = {}  # job id -> time.monotonic() when it finished
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.ttl
+        for job_id in [j for j, t in self._finished.items() if t < cutoff]:
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+
+    def _update(self, job_id: str, on_update, **changes):
+        with self._lock:
+            status = self._jobs[job_id]
+            status.update(changes)
+            if status["state"] in ("done", "failed"):
+                self._finished[job_id] = time.monotonic()
+            status = dict(status)
+        if on_update:
+            try:
+                on_update(status)
+            except Exception as e:
+                logger.warning("[Ingest] Progress callback failed for job %s: %s", job_id, e)
+
+    def submit(self, name: str, fn: Callable[[Callable[[float], None]], None], on_update=None) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = {"job_id": job_id, "name": name, "state": "queued", "progress": 0.0, "error": None}
+
+        def run():
+            self._update(job_id, on_update, state="running")
+            try:
+                fn(lambda fraction: self._update(job_id, on_update, progress=round(fraction, 4)))
+                self._update(job_id, on_update, state="done", progress=1.0)
+            except Exception as e:
+                logger.exception("[Ingest] Job %s (%s) failed", job_id, name)
+                self._update(job_id, on_update, state="failed", error=str(e))
+
+        self._executor.submit(run)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            self._prune()
+            status = self._jobs.get(job_id)
+            return dict(status) if status else None
+
+
+_ingest_jobs = None
+_ingest_jobs_lock = threading.Lock()
+
+
+def get_ingest_jobs() -> IngestJobs:
+    global _ingest_jobs
+    with _ingest_jobs_lock:
+        if _ingest_jobs is None:
+            _ingest_jobs = IngestJobs()
+        return _ingest_jobs
@@ -0,0 +1,114 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+EVICT_EVERY = 50
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Disk-backed exact-match cache for chat model generations.
+
+    Entries are keyed by a hash of the model settings (`llm_string`, which
+    carries the model name and temperature) and a hash of the rendered prompt.
+    Least recently used rows are evicted beyond `max_entries`, and rows older
+    than `ttl_seconds` are treated as misses.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl_seconds: Optional[float] = 7 * 24 * 3600):
+        logger.info("[SQLiteLLMCache] Opening cache at: %s", path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                llm_hash TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (llm_hash, prompt_hash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = (_hash(llm_string), _hash(prompt))
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE llm_hash = ? AND prompt_hash = ?", key
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE llm_hash = ? AND prompt_hash = ?", key)
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE llm_hash = ? AND prompt_hash = ?", (now, *key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        try:
+            return loads(row[0])
+        except Exception as e:
+            logger.warning("[SQLiteLLMCache] Dropping unreadable entry: %s", e)
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = (_hash(llm_string), _hash(prompt))
+        now = time.time()
+        try:
+            payload = dumps(return_val)
+        except Exception as e:
+            logger.warning("[SQLiteLLMCache] Could not serialise generations: %s", e)
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)", (*key, payload, now, now)
+            )
+            self._writes += 1
+            # Trimming scans the access index, so only do it every so often
+            if self._writes % EVICT_EVERY == 0:
+                self._conn.execute(
+                    """DELETE FROM llm_cache WHERE rowid IN (
+                        SELECT rowid FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                    )""",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self, **kwargs) -> None:
+        logger.info("[SQLiteLLMCache] Clearing cache")
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
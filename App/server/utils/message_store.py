@@ -1,26 +1,67 @@
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Latest transcript lines always kept verbatim in prompts
+HISTORY_RECENT_TURNS = 20
+# Fold older lines into the summary once this many have piled up
+HISTORY_SUMMARY_EVERY = 10
+# Most lines folded in one summarizer call, so its prompt stays small too
+HISTORY_SUMMARY_MAX_BATCH = 50
+# Upper bound on the history part of a prompt
+HISTORY_TOKEN_BUDGET = 1500
+# Rough token estimate; close enough for English transcripts
+CHARS_PER_TOKEN = 4
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
 class MessageStore:
     """
     Class to store and manage chat messages and associated data.
+
+    `get_messages` returns a session's whole transcript. Prompts use
+    `get_history` instead: a running summary of older lines followed by the
+    latest ones verbatim, trimmed to a token budget, so prompt size stays flat
+    however long the meeting runs. With a `summarizer` (called with the
+    previous summary and the lines to fold in, returning the new summary), the
+    summary is brought up to date in the background every `summary_every`
+    lines; without one, older lines are simply dropped from the view.
     """
 
-    def __init__(self):
+    def __init__(self, summarizer: Optional[Callable[[str, List[str]], str]] = None,
+                 recent_turns: int = HISTORY_RECENT_TURNS, summary_every: int = HISTORY_SUMMARY_EVERY,
+                 token_budget: int = HISTORY_TOKEN_BUDGET):
         logger.info("[MessageStore] Initializing store")
         self.messages = {}
         self.ai_messages = {}
         self.follow_up_questions = {}
         self.selected_questions_responses = {}
+        self.summarizer = summarizer
+        self.recent_turns = recent_turns
+        self.summary_every = summary_every
+        self.token_budget = token_budget
+        self.summaries = {}  # session id -> (summary, number of lines it covers)
+        self._summarizing = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
 
     def add_message(self, formatted_message):
         try:
             session_id = formatted_message['sessionId']
             text = formatted_message['text']
             logger.info("[MessageStore] Adding message to session %s: %s", session_id, text)
-            self.messages.setdefault(session_id, []).append(text)
+            with self._lock:
+                self.messages.setdefault(session_id, []).append(text)
+            self._maybe_summarize(session_id)
         except Exception as e:
             logger.error("[MessageStore] Failed to add message: %s", e)
 
@@ -28,17 +69,89 @@ class MessageStore:
         logger.info("[MessageStore] Retrieving messages for session %s", session_id)
         return self.messages.get(session_id, [])
 
+    def get_history(self, session_id, token_budget: Optional[int] = None) -> List[str]:
+        """
+        Prompt view of a session: the summary of older lines (if any) followed
+        by the newest lines that fit in `token_budget` tokens.
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        with self._lock:
+            messages = self.messages.get(session_id, [])
+            summary, covered = self.summaries.get(session_id, ("", 0))
+            # Lines not folded into the summary yet; bounded by recent_turns +
+            # summary_every while a refresh is running
+            unsummarized = messages[covered:]
+
+        view = []
+        if summary:
+            summary_line = SUMMARY_PREFIX + summary
+            # The summary may use at most half of the budget
+            limit = (budget // 2) * CHARS_PER_TOKEN
+            if len(summary_line) > limit:
+                summary_line = summary_line[:limit].rsplit(" ", 1)[0] + " ..."
+            budget -= estimate_tokens(summary_line)
+            view.append(summary_line)
+
+        recent = []
+        for line in reversed(unsummarized):
+            cost = estimate_tokens(line)
+            if cost > budget:
+                break
+            budget -= cost
+            recent.append(line)
+        return view + recent[::-1]
+
+    def _maybe_summarize(self, session_id):
+        if self.summarizer is None:
+            return
+        with self._lock:
+            messages = self.messages.get(session_id, [])
+            _, covered = self.summaries.get(session_id, ("", 0))
+            target = min(len(messages) - self.recent_turns, covered + HISTORY_SUMMARY_MAX_BATCH)
+            if target - covered < self.summary_every or session_id in self._summarizing:
+                return
+            self._summarizing.add(session_id)
+            generation = self._generation
+        self.executor.submit(self._summarize, session_id, target, generation)
+
+    def _summarize(self, session_id, target: int, generation: int):
+        summarized = False
+        try:
+            with self._lock:
+                summary, covered = self.summaries.get(session_id, ("", 0))
+                lines = self.messages.get(session_id, [])[covered:target]
+            if not lines:
+                return
+            updated = self.summarizer(summary, lines)
+            with self._lock:
+                if generation == self._generation:
+                    self.summaries[session_id] = (str(updated).strip(), target)
+            summarized = True
+            logger.info("[MessageStore] Summarized %d lines of session %s", target, session_id)
+        except Exception as e:
+            logger.warning("[MessageStore] Could not summarize session %s: %s", session_id, e)
+        finally:
+            with self._lock:
+                self._summarizing.discard(session_id)
+        # Lines may have piled up while the summarizer was running
+        if summarized:
+            self._maybe_summarize(session_id)
+
     def clear_messages(self):
         logger.info("[MessageStore] Clearing all stored messages")
-        self.messages = {}
-        self.ai_messages = {}
+        with self._lock:
+            self.messages = {}
+            self.ai_messages = {}
+            self.summaries = {}
+            self._generation += 1
 
     def add_ai_message(self, data):
         try:
             session_id = data['sessionId']
             ai_message = data['aiMessage']
             logger.info("[MessageStore] Adding AI message to session %s", session_id)
-            self.ai_messages.setdefault(session_id, []).append(ai_message)
+            with self._lock:
+                self.ai_messages.setdefault(session_id, []).append(ai_message)
         except Exception as e:
             logger.error("[MessageStore] Failed to add AI message: %s", e)
 
@@ -51,7 +164,8 @@ class MessageStore:
             session_id = data['sessionId']
             questions = data['followUpQuestions']
             logger.info("[MessageStore] Adding follow-up questions to session %s", session_id)
-            self.follow_up_questions.setdefault(session_id, []).append(questions)
+            with self._lock:
+                self.follow_up_questions.setdefault(session_id, []).append(questions)
         except Exception as e:
             logger.error("[MessageStore] Failed to add follow-up questions: %s", e)
 
@@ -62,7 +176,8 @@ class MessageStore:
     def add_selected_question_and_response(self, session_id, selected_question, response):
         try:
             logger.info("[MessageStore] Storing selected question response for session %s: %s", session_id, selected_question)
-            self.selected_questions_responses.setdefault(session_id, {})[selected_question] = response
+            with self._lock:
+                self.selected_questions_responses.setdefault(session_id, {})[selected_question] = response
         except Exception as e:
             logger.error("[MessageStore] Failed to store selected question and response: %s", e)
 
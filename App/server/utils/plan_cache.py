@@ -0,0 +1,203 @@
+import re
+import ast
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from io import StringIO
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .frame_cache import private_copy
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+PLAN_CACHE_SIZE = 1000
+
+# Literal values in a question that may be swapped for parameters: quoted text,
+# numbers, and runs of capitalised or ID-like words ("John Doe", "ES41")
+LITERAL_PATTERN = re.compile(
+    r"\"(?P<dq>[^\"]+)\"|'(?P<sq>[^']+)'"
+    r"|(?P<num>(?<![\w.])-?\d+(?:\.\d+)?(?![\w.]))"
+    r"|(?P<word>[A-Z][\w@.\-]*(?:\s+[A-Z][\w@.\-]*)*)"
+)
+PARAM_TOKEN = "__PLAN_PARAM_{}__"
+
+
+def extract_literals(question: str) -> List[str]:
+    literals = []
+    for match in LITERAL_PATTERN.finditer(question):
+        value = next(v for v in match.groupdict().values() if v is not None)
+        literals.append(value.rstrip(".-"))
+    return literals
+
+
+def question_template(question: str) -> str:
+    """
+    "Age of 'John Doe'?" and "Age of 'Jane Roe'?" share the template "age of {}?".
+    """
+    template = LITERAL_PATTERN.sub("{}", question)
+    return " ".join(template.lower().split())
+
+
+def schema_of(df: pd.DataFrame) -> tuple:
+    return tuple((str(c), str(t)) for c, t in df.dtypes.items())
+
+
+def _is_number(text: str) -> bool:
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _literal_pattern(value: str) -> re.Pattern:
+    if _is_number(value):
+        return re.compile(r"(?<![\w.'\"])" + re.escape(value) + r"(?![\w.'\"])")
+    return re.compile(r"(['\"])" + re.escape(value) + r"\1")
+
+
+def _render(value: str, template_value: str) -> str:
+    # Numbers stay numbers; everything else becomes a safely escaped string literal
+    if _is_number(template_value):
+        if not _is_number(value):
+            raise ValueError(f"{value!r} is not a number")
+        return value
+    return repr(value)
+
+
+def run_code(code: str, df: pd.DataFrame) -> str:
+    """
+    Run pandas code the way the agent's python_repl_ast tool does: every
+    statement is executed and the value of the last expression (or whatever it
+    printed) is returned. Unlike the tool, errors are raised.
+    """
+    tree = ast.parse(code)
+    scope = {"df": df, "pd": pd, "np": np}
+    exec(compile(ast.Module(tree.body[:-1], type_ignores=[]), "<plan>", "exec"), scope)
+    last = tree.body[-1:]
+    buffer = StringIO()
+    with redirect_stdout(buffer):
+        if last and isinstance(last[0], ast.Expr):
+            result = eval(compile(ast.Expression(last[0].value), "<plan>", "eval"), scope)
+        else:
+            exec(compile(ast.Module(last, type_ignores=[]), "<plan>", "exec"), scope)
+            result = None
+    return buffer.getvalue() if result is None else str(result)
+
+
+def executed_code(intermediate_steps) -> Optional[str]:
+    """
+    The last snippet the agent ran through python_repl_ast, if it ran cleanly.
+    """
+    for action, observation in reversed(intermediate_steps or []):
+        if getattr(action, "tool", None) != "python_repl_ast":
+            continue
+        tool_input = action.tool_input
+        code = tool_input.get("query") if isinstance(tool_input, dict) else tool_input
+        if not code or re.match(r"^\w+(Error|Exception): ", str(observation)):
+            return None
+        return code.strip().strip("`").removeprefix("python").strip()
+    return None
+
+
+class _Plan:
+    def __init__(self, code: str, params: dict, fixed: dict):
+        self.code = code      # Code with PARAM_TOKEN placeholders
+        self.params = params  # literal index -> value it was recorded with
+        self.fixed = fixed    # literal index -> value that must match exactly
+
+
+class PlanCache:
+    """
+    Reuses the pandas code the CSV agent wrote for earlier questions.
+
+    A question is reduced to a template by replacing its literal values with
+    placeholders. Literals that appear in the agent's code become parameters;
+    the rest must match exactly for a later question to reuse the plan.
+    Entries are keyed by (table path, template, column schema), so a table
+    whose columns change never reuses code written for the old schema.
+    """
+
+    def __init__(self, max_entries: int = PLAN_CACHE_SIZE):
+        logger.info("[PlanCache] Initializing with max_entries=%d", max_entries)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, path: str, df: pd.DataFrame, question: str, intermediate_steps):
+        code = executed_code(intermediate_steps)
+        if code is None:
+            return
+        literals = extract_literals(question)
+        params, fixed = {}, {}
+        for i, value in enumerate(literals):
+            pattern = _literal_pattern(value)
+            if pattern.search(code):
+                code = pattern.sub(PARAM_TOKEN.format(i), code)
+                params[i] = value
+            else:
+                fixed[i] = value
+
+        key = (path, question_template(question), schema_of(df))
+        with self._lock:
+            # Drop plans recorded against a different schema of the same table
+            for stale in [k for k in self._plans if k[0] == path and k[2] != key[2]]:
+                del self._plans[stale]
+            plans = self._plans.setdefault(key, [])
+            plans[:] = [p for p in plans if p.fixed != fixed]
+            plans.append(_Plan(code, params, fixed))
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        logger.info("[PlanCache] Recorded plan for %r with %d parameter(s)", key[1], len(params))
+
+    def _find(self, path: str, df: pd.DataFrame, question: str):
+        key = (path, question_template(question), schema_of(df))
+        literals = extract_literals(question)
+        with self._lock:
+            plans = self._plans.get(key)
+            if not plans:
+                return None, literals
+            self._plans.move_to_end(key)
+            for plan in reversed(plans):
+                if all(literals[i] == v for i, v in plan.fixed.items()):
+                    return plan, literals
+        return None, literals
+
+    def run(self, path: str, df: pd.DataFrame, question: str) -> Optional[str]:
+        """
+        Answer `question` from a cached plan, or return None on a miss or if
+        the cached code fails against the current data.
+        """
+        plan, literals = self._find(path, df, question)
+        if plan is None:
+            self.misses += 1
+            return None
+        try:
+            code = plan.code
+            for i, recorded in plan.params.items():
+                code = code.replace(PARAM_TOKEN.format(i), _render(literals[i], recorded))
+            output = run_code(code, private_copy(df))
+        except Exception as e:
+            logger.warning("[PlanCache] Cached plan failed, falling back to agent: %s", e)
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.info("[PlanCache] Answered %r from cached plan", question)
+        return output
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = sum(len(p) for p in self._plans.values())
+        return {"hits": self.hits, "misses": self.misses, "templates": len(self._plans), "plans": entries}
@@ -0,0 +1,315 @@
+import os
+import re
+import json
+import math
+import difflib
+import logging
+import tempfile
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# The model's probability must reach GATE_YES_THRESHOLD (or fall to
+# GATE_NO_THRESHOLD) to decide without the LLM; anything between is ambiguous
+GATE_YES_THRESHOLD = float(os.environ.get("GATE_YES_THRESHOLD", 0.90))
+GATE_NO_THRESHOLD = float(os.environ.get("GATE_NO_THRESHOLD", 0.10))
+# Utterances with fewer words are never questions worth answering
+GATE_MIN_WORDS = int(os.environ.get("GATE_MIN_WORDS", 3))
+# Run the LLM chains anyway and only record whether the local decision agreed
+GATE_SHADOW = os.environ.get("GATE_SHADOW", "0") == "1"
+# Transcript lines and the LLM's labels are written to disk (and the model
+# trained from them) only when this is explicitly turned on
+GATE_LOG_DECISIONS = os.environ.get("GATE_LOG_DECISIONS", "0") == "1"
+
+# Logged LLM decisions needed before the model is trusted
+GATE_MIN_TRAINING = 200
+# Retrain after this many new logged decisions
+GATE_RETRAIN_EVERY = 500
+GATE_MAX_FEATURES = 5000
+GATE_MIN_DF = 2
+GATE_EPOCHS = 500
+GATE_LEARNING_RATE = 2.0
+GATE_L2 = 1e-3
+# A question this close to an earlier line was already asked
+GATE_DUPLICATE_RATIO = 0.90
+GATE_HISTORY_WINDOW = 50
+# Agreement is logged every this many shadow comparisons
+GATE_REPORT_EVERY = 50
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+SPEAKER_PATTERN = re.compile(r"^[^:]{1,40}:\s*")
+
+# Fillers, acknowledgements and greetings only: a line made of nothing else
+# carries no question
+FILLER_WORDS = frozenset(
+    "ok okay yeah yes yep yup no nope nah uh um umm uhm hmm mm hm ah oh right sure alright cool great "
+    "nice good fine thanks hi hello hey bye goodbye so well sorry".split()
+)
+
+
+def words(text: str) -> List[str]:
+    return WORD_PATTERN.findall(str(text).lower())
+
+
+def features(text: str) -> List[str]:
+    tokens = words(text)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+class _Model:
+    """
+    TF-IDF over word unigrams and bigrams followed by logistic regression,
+    all in NumPy so it loads from a single .npz file.
+    """
+
+    def __init__(self, vocabulary: dict, idf: np.ndarray, weights: np.ndarray, bias: float, trained_on: int):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+        self.trained_on = trained_on
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for feature, count in Counter(features(text)).items():
+            column = self.vocabulary.get(feature)
+            if column is not None:
+                vector[column] = count * self.idf[column]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def probability(self, text: str) -> float:
+        return float(_sigmoid(self._vector(text) @ self.weights + self.bias))
+
+    @classmethod
+    def fit(cls, texts: List[str], labels: List[bool]) -> "_Model":
+        df = Counter()
+        for text in texts:
+            df.update(set(features(text)))
+        kept = [f for f, n in df.most_common(GATE_MAX_FEATURES) if n >= GATE_MIN_DF]
+        vocabulary = {f: i for i, f in enumerate(kept)}
+        n = len(texts)
+        idf = np.array([math.log((1 + n) / (1 + df[f])) + 1 for f in kept], dtype=np.float32)
+
+        model = cls(vocabulary, idf, np.zeros(len(kept), dtype=np.float32), 0.0, n)
+        x = np.stack([model._vector(t) for t in texts]) if kept else np.zeros((n, 0), dtype=np.float32)
+        y = np.asarray(labels, dtype=np.float32)
+        # Classes are weighted equally, since most meeting lines are not questions
+        positives = max(1.0, float(y.sum()))
+        negatives = max(1.0, float(n - y.sum()))
+        sample_weight = np.where(y == 1, n / (2 * positives), n / (2 * negatives)).astype(np.float32)
+
+        weights = np.zeros(x.shape[1], dtype=np.float32)
+        bias = 0.0
+        for _ in range(GATE_EPOCHS):
+            error = (_sigmoid(x @ weights + bias) - y) * sample_weight
+            weights -= GATE_LEARNING_RATE * (x.T @ error / n + GATE_L2 * weights)
+            bias -= GATE_LEARNING_RATE * float(error.mean())
+        model.weights = weights
+        model.bias = bias
+        return model
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".npz", dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, vocabulary=json.dumps(list(self.vocabulary)), idf=self.idf, weights=self.weights,
+                     bias=self.bias, trained_on=self.trained_on)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "_Model":
+        with np.load(path) as data:
+            vocabulary = {f: i for i, f in enumerate(json.loads(str(data["vocabulary"])))}
+            return cls(vocabulary, data["idf"], data["weights"], float(data["bias"]), int(data["trained_on"]))
+
+
+class ResponseGate:
+    """
+    Decides locally whether a transcript line needs an AI response, so the
+    LLM yes/no chains only see the lines that are genuinely ambiguous.
+
+    `decide` returns (True/False, source) when it is confident and
+    (None, None) otherwise:
+      - lines shorter than `min_words`, or made only of fillers and
+        greetings ("um, okay, sure"), are a confident no;
+      - otherwise a TF-IDF/logistic model trained on the logged LLM decisions
+        answers when its probability is outside (no_threshold, yes_threshold).
+        A confident yes is still a no when the question repeats a recent line.
+
+    With `log_decisions` on, every LLM decision (the raw transcript line and
+    its label) is appended to `log_path`, and the model is retrained in the
+    background from that log every GATE_RETRAIN_EVERY new decisions and stored
+    at `model_path`. Without it nothing is written and only the rules and an
+    existing model are used. With `shadow` on, the LLM decides every line and
+    the gate only records how often its classifier agreed with the label.
+    """
+
+    def __init__(self, model_path: str = None, log_path: str = None, yes_threshold: float = GATE_YES_THRESHOLD,
+                 no_threshold: float = GATE_NO_THRESHOLD, min_words: int = GATE_MIN_WORDS,
+                 shadow: bool = GATE_SHADOW, log_decisions: bool = GATE_LOG_DECISIONS):
+        logger.info("[ResponseGate] Initializing (yes>=%.2f, no<=%.2f, min_words=%d, shadow=%s, log_decisions=%s)",
+                    yes_threshold, no_threshold, min_words, shadow, log_decisions)
+        self.model_path = model_path
+        self.log_path = log_path if log_decisions else None
+        self.yes_threshold = yes_threshold
+        self.no_threshold = no_threshold
+        self.min_words = min_words
+        self.shadow = shadow
+        self.model: Optional[_Model] = None
+        self.decisions = Counter()  # source -> lines decided locally
+        self.llm_calls = 0
+        self.agreement = {}  # source -> [agreed, compared]
+        self._logged = 0
+        self._lock = threading.Lock()
+        self._training = threading.Lock()
+        if model_path and os.path.exists(model_path):
+            try:
+                self.model = _Model.load(model_path)
+                logger.info("[ResponseGate] Loaded model trained on %d decisions", self.model.trained_on)
+            except Exception as e:
+                logger.warning("[ResponseGate] Could not read %s: %s", model_path, e)
+        self._logged = self._count_logged()
+        if self._logged - (self.model.trained_on if self.model else 0) >= GATE_RETRAIN_EVERY or \
+                (self.model is None and self._logged >= GATE_MIN_TRAINING):
+            self._retrain_async()
+
+    def _count_logged(self) -> int:
+        if not self.log_path or not os.path.exists(self.log_path):
+            return 0
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            return sum(1 for _ in f)
+
+    def _rules(self, text: str) -> Optional[bool]:
+        tokens = words(text)
+        if len(tokens) < self.min_words:
+            return False
+        if all(t in FILLER_WORDS for t in tokens):
+            return False
+        return None
+
+    @staticmethod
+    def _is_repeat(text: str, history: List[str]) -> bool:
+        target = " ".join(words(text))
+        earlier = list(history)
+        # The store already holds the line being checked
+        if earlier and " ".join(words(SPEAKER_PATTERN.sub("", earlier[-1]))) == target:
+            earlier = earlier[:-1]
+        for line in earlier[-GATE_HISTORY_WINDOW:]:
+            previous = " ".join(words(SPEAKER_PATTERN.sub("", line)))
+            if difflib.SequenceMatcher(None, target, previous).ratio() >= GATE_DUPLICATE_RATIO:
+                return True
+        return False
+
+    def classify(self, text: str) -> Tuple[Optional[bool], Optional[str]]:
+        """
+        (is_question, source) where source is "rule" or "model", or
+        (None, None) when neither is confident. This is the initial-check
+        label the model is trained on.
+        """
+        decision = self._rules(text)
+        if decision is not None:
+            return decision, "rule"
+        model = self.model
+        if model is None:
+            return None, None
+        probability = model.probability(text)
+        if probability <= self.no_threshold:
+            return False, "model"
+        if probability >= self.yes_threshold:
+            return True, "model"
+        return None, None
+
+    def decide(self, text: str, history: List[str]) -> Tuple[Optional[bool], Optional[str]]:
+        """
+        (decision, source) as in `classify`, except that a question repeating
+        a line of `history` needs no response. (None, None) means the LLM
+        chains should decide.
+        """
+        decision, source = self.classify(text)
+        if decision and source == "model":
+            return not self._is_repeat(text, history), source
+        return decision, source
+
+    def record_local(self, source: str):
+        with self._lock:
+            self.decisions[source] += 1
+
+    def record_llm(self, text: str, is_question: bool):
+        """
+        Log the LLM's "is this a business question" answer as training data.
+        When the gate's own classifier was confident about the line (in shadow
+        mode), whether it gave the same label is counted per source.
+        """
+        predicted, source = self.classify(text)
+        with self._lock:
+            self.llm_calls += 1
+            if source is not None:
+                counts = self.agreement.setdefault(source, [0, 0])
+                counts[0] += int(predicted == bool(is_question))
+                counts[1] += 1
+                if sum(c[1] for c in self.agreement.values()) % GATE_REPORT_EVERY == 0:
+                    logger.info("[ResponseGate] Shadow agreement: %s", self.stats()["agreement"])
+            if not self.log_path:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"text": text, "label": bool(is_question)}) + "\n")
+                self._logged += 1
+            except Exception as e:
+                logger.warning("[ResponseGate] Could not log decision: %s", e)
+                return
+            trained_on = self.model.trained_on if self.model else 0
+            due = self._logged - trained_on >= GATE_RETRAIN_EVERY or \
+                (self.model is None and self._logged >= GATE_MIN_TRAINING and self._logged % GATE_MIN_TRAINING == 0)
+        if due:
+            self._retrain_async()
+
+    def _retrain_async(self):
+        if not self._training.acquire(blocking=False):
+            return
+        threading.Thread(target=self._retrain, daemon=True, name="response-gate-train").start()
+
+    def _retrain(self):
+        try:
+            texts, labels = [], []
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    texts.append(entry["text"])
+                    labels.append(bool(entry["label"]))
+            if len(texts) < GATE_MIN_TRAINING or len(set(labels)) < 2:
+                return
+            model = _Model.fit(texts, labels)
+            if self.model_path:
+                model.save(self.model_path)
+            self.model = model
+            logger.info("[ResponseGate] Trained on %d decisions (%d features)", len(texts), len(model.vocabulary))
+        except Exception as e:
+            logger.warning("[ResponseGate] Training failed: %s", e)
+        finally:
+            self._training.release()
+
+    def stats(self) -> dict:
+        local = sum(self.decisions.values())
+        total = local + self.llm_calls
+        return {
+            "decided_locally": dict(self.decisions),
+            "llm_calls": self.llm_calls,
+            "local_rate": local / total if total else 0.0,
+            "agreement": {s: (a / n if n else None, n) for s, (a, n) in self.agreement.items()},
+            "trained_on": self.model.trained_on if self.model else 0,
+        }
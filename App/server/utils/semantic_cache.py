@@ -0,0 +1,159 @@
+import re
+import logging
+import threading
+from typing import Callable, FrozenSet, Hashable, Optional, Tuple
+
+import numpy as np
+
+from .action_index import terms
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# Single letters name things ("customer a", "shop b") even though "a" is a stopword
+LETTER_PATTERN = re.compile(r"\b[a-z]\b")
+
+
+def literal_key(query: str) -> FrozenSet[str]:
+    """
+    Every non-stopword token of a query, lowercased and stemmed, plus single
+    letters. Names and values are not always capitalised in speech-to-text
+    ("total sales for shop b" / "... shop c"), so no token is trusted to be
+    generic: two queries share a key only when they mention the same values.
+    """
+    lowered = str(query).lower()
+    return frozenset(terms(lowered)) | frozenset(LETTER_PATTERN.findall(lowered))
+
+
+class _Namespace:
+    def __init__(self, dim: int, capacity: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.queries = [None] * capacity
+        self.keys = [None] * capacity
+        self.answers = [None] * capacity
+        self.size = 0
+        self.next = 0
+
+
+class SemanticCache:
+    """
+    Cross-session answer cache matched on query embeddings.
+
+    Each namespace ("tangential", "copilot", ...) holds a fixed-size ring of
+    unit-normalised query vectors in a NumPy matrix; a lookup is one
+    matrix-vector product and returns the stored answer of the closest query
+    when its cosine similarity reaches `threshold`.
+
+    `version_fn` should return something that changes whenever the data the
+    answers were built from changes; the cache is emptied when it does.
+
+    A similar query is only a hit when `key_fn` gives both queries the same
+    key (by default the values they mention), because questions about
+    different customers are otherwise near-identical. A query whose key is
+    empty says nothing that pins down its answer and bypasses the cache.
+    """
+
+    def __init__(self, embeddings, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = 2000,
+                 version_fn: Optional[Callable[[], Hashable]] = None,
+                 key_fn: Callable[[str], Hashable] = literal_key):
+        logger.info("[SemanticCache] Initializing with threshold=%.3f, max_entries=%d", threshold, max_entries)
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self.key_fn = key_fn
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _current_version(self):
+        if self.version_fn is None:
+            return None
+        try:
+            return self.version_fn()
+        except Exception as e:
+            logger.warning("[SemanticCache] version_fn failed: %s", e)
+            return self.version
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self.version is not None:
+                logger.info("[SemanticCache] Source data changed, dropping %d namespaces", len(self._namespaces))
+            self._namespaces = {}
+            self.version = version
+
+    def lookup(self, namespace: str, query: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Returns (answer, query_vector). `answer` is None on a miss; pass the
+        vector back to `update` to avoid embedding the query twice.
+        """
+        key = self.key_fn(query)
+        if not key:
+            return None, None
+        try:
+            vector = self._embed(query)
+        except Exception as e:
+            logger.warning("[SemanticCache] Embedding failed, skipping cache: %s", e)
+            return None, None
+
+        version = self._current_version()
+        with self._lock:
+            self._check_version(version)
+            ns = self._namespaces.get(namespace)
+            if ns is None or ns.size == 0:
+                self.misses += 1
+                return None, vector
+            scores = ns.vectors[:ns.size] @ vector
+            close = np.flatnonzero(scores >= self.threshold)
+            for best in close[np.argsort(-scores[close])]:
+                if ns.keys[best] == key:
+                    self.hits += 1
+                    logger.info("[SemanticCache] Hit in %s (%.3f): %r ~ %r", namespace, scores[best], query, ns.queries[best])
+                    return ns.answers[best], vector
+            self.misses += 1
+            return None, vector
+
+    def update(self, namespace: str, query: str, answer: str, vector: Optional[np.ndarray] = None):
+        key = self.key_fn(query)
+        if not key:
+            return
+        if vector is None:
+            try:
+                vector = self._embed(query)
+            except Exception as e:
+                logger.warning("[SemanticCache] Embedding failed, not caching: %s", e)
+                return
+
+        version = self._current_version()
+        with self._lock:
+            self._check_version(version)
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                ns = _Namespace(vector.shape[0], self.max_entries)
+                self._namespaces[namespace] = ns
+            # Oldest entry is overwritten once the ring is full
+            slot = ns.next
+            ns.vectors[slot] = vector
+            ns.queries[slot] = query
+            ns.keys[slot] = key
+            ns.answers[slot] = answer
+            ns.next = (slot + 1) % self.max_entries
+            ns.size = min(ns.size + 1, self.max_entries)
+
+    def clear(self):
+        with self._lock:
+            self._namespaces = {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            sizes = {name: ns.size for name, ns in self._namespaces.items()}
+        return {"hits": self.hits, "misses": self.misses, "entries": sizes}
@@ -0,0 +1,154 @@
+import os
+import re
+import sqlite3
+import logging
+import threading
+from typing import List
+
+import pandas as pd
+from langchain_openai import ChatOpenAI
+from langchain_community.utilities import SQLDatabase
+from langchain_community.agent_toolkits import create_sql_agent
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # Points to 'app/server'
+SQLITE_DB_PATH = os.path.join(BASE_DIR, "csv_db", "tables.sqlite")
+
+INGEST_CHUNK_ROWS = 100_000
+KEY_COLUMN_PATTERN = re.compile(r"(^|[\s_])(id|key|code|name|email)$", re.IGNORECASE)
+
+
+def table_name_for(db_entry: dict) -> str:
+    """
+    SQLite table name for a db.txt entry, derived from the CSV file name.
+    """
+    path = db_entry.get("db_path") or db_entry.get("database_path")
+    stem = os.path.splitext(os.path.basename(path))[0]
+    name = re.sub(r"\W+", "_", stem).strip("_").lower()
+    return name if name and not name[0].isdigit() else f"t_{name}"
+
+
+def _sql_type(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+def _quote(identifier: str) -> str:
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS _ingest (tbl TEXT PRIMARY KEY, source TEXT, mtime_ns INTEGER, size INTEGER)"
+    )
+    return conn
+
+
+_ingest_lock = threading.Lock()
+
+
+def ingest_csv(csv_path: str, table: str, db_path: str = SQLITE_DB_PATH):
+    """
+    (Re)load a CSV into `table`. Column types are inferred from the first
+    chunk and key-like columns (IDs, names, codes, emails) get an index.
+    """
+    csv_path = os.path.abspath(csv_path)
+    st = os.stat(csv_path)
+    logger.info("[SQLEngine] Ingesting %s into table %s", csv_path, table)
+    with _ingest_lock:
+        conn = _connect(db_path)
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+            columns = None
+            for chunk in pd.read_csv(csv_path, chunksize=INGEST_CHUNK_ROWS):
+                if columns is None:
+                    columns = list(chunk.columns)
+                    column_sql = ", ".join(f"{_quote(c)} {_sql_type(chunk[c].dtype)}" for c in columns)
+                    conn.execute(f"CREATE TABLE {_quote(table)} ({column_sql})")
+                placeholders = ", ".join("?" for _ in columns)
+                rows = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+                conn.executemany(f"INSERT INTO {_quote(table)} VALUES ({placeholders})", rows)
+
+            for column in columns or []:
+                if KEY_COLUMN_PATTERN.search(str(column)):
+                    suffix = re.sub(r"\W+", "_", str(column)).lower()
+                    index_name = _quote(f"ix_{table}_{suffix}")
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {_quote(table)} ({_quote(column)})")
+
+            conn.execute(
+                "INSERT OR REPLACE INTO _ingest VALUES (?, ?, ?, ?)", (table, csv_path, st.st_mtime_ns, st.st_size)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def ensure_table(csv_path: str, table: str, db_path: str = SQLITE_DB_PATH):
+    """
+    Ingest `csv_path` unless `table` already holds the current version of it.
+    Returns the (mtime_ns, size) of the ingested CSV.
+    """
+    st = os.stat(csv_path)
+    signature = (st.st_mtime_ns, st.st_size)
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT mtime_ns, size FROM _ingest WHERE tbl = ?", (table,)).fetchone()
+    finally:
+        conn.close()
+    if row != signature:
+        ingest_csv(csv_path, table, db_path)
+    return signature
+
+
+class SQLAgentGPTInstance:
+    """
+    Answers tabular questions by having the LLM write SQL against the SQLite
+    copy of the selected databases, opened read-only.
+    """
+
+    def __init__(self, debug=False, db_path: str = SQLITE_DB_PATH) -> None:
+        logger.info("[SQLAgent] Initializing SQLAgentGPTInstance with debug=%s", debug)
+        self.llm = ChatOpenAI(temperature=0, model="gpt-3.5-turbo")
+        self.debug = debug
+        self.db_path = db_path
+        self._agents = {}
+        self._lock = threading.Lock()
+
+    def get_sql_agent(self, tables: List[str], signature=None):
+        key = (tuple(sorted(tables)), signature)
+        with self._lock:
+            agent = self._agents.get(key)
+        if agent is not None:
+            return agent
+
+        logger.info("[SQLAgent] Creating SQL agent for tables: %s", tables)
+        db = SQLDatabase.from_uri(
+            f"sqlite:///file:{self.db_path}?mode=ro&uri=true",
+            include_tables=list(tables),
+            sample_rows_in_table_info=3,
+        )
+        agent = create_sql_agent(self.llm, db=db, agent_type="openai-tools", verbose=self.debug)
+        with self._lock:
+            # Agents for older versions of these tables hold a stale schema
+            self._agents = {k: v for k, v in self._agents.items() if k[0] != key[0]}
+            return self._agents.setdefault(key, agent)
+
+    def get_sql_agent_output(self, db_entries: List[dict], question: str):
+        tables = []
+        signature = []
+        for entry in db_entries:
+            table = table_name_for(entry)
+            signature.append((table, ensure_table(entry["db_path"], table, self.db_path)))
+            tables.append(table)
+        logger.info("[SQLAgent] Getting SQL agent output for question: %s", question)
+        result = self.get_sql_agent(tables, tuple(sorted(signature))).invoke(question)
+        logger.info("[SQLAgent] Output result: %s", result)
+        return result